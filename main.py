@@ -1,18 +1,41 @@
+import asyncio
 import os
 import sys
 import time
 
+from clickhouse_connect import get_async_client as get_async_clickhouse_client
 from clickhouse_connect import get_client as get_clickhouse_client
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
-from python.env import get_database_url, get_smtp_config
+from python.aio import process_runs_async
+from python.clickhouse import Aggregates
+from python.coalesce import dedup
+from python.env import (
+    get_alert_config,
+    get_database_url,
+    get_monitor_config,
+    get_outbox_config,
+    get_smtp_config,
+)
+from python.listen import RunTracker
+from python.metrics import metrics, record_cycle, serve_metrics
+from python.outbox import Dispatcher
+from python.recipients import recipients
+from python.scheduler import FairQueue, RunScheduler
 from python.server import process_runs
+from python.shard import ShardLease
+from python.supervisor import Supervisor
+from python.tail import MetricTail
+from python.triggers import TriggerCache
 
 load_dotenv()
 
 SMTP_CONFIG = get_smtp_config()
+MONITOR_CONFIG = get_monitor_config()
+OUTBOX_CONFIG = get_outbox_config()
+ALERT_CONFIG = get_alert_config()
 DATABASE_URL = get_database_url()
 CH_URL = os.getenv("CLICKHOUSE_URL", "url")
 CH_USER = os.getenv("CLICKHOUSE_USER", "user")
@@ -34,28 +57,183 @@ def start():
         connect_args={"check_same_thread": False}
         if DATABASE_URL.startswith("sqlite")
         else {},
+        pool_pre_ping=True,
+    )
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: metrics.inc("monitor_postgres_queries_total"),
     )
     Session = sessionmaker(bind=engine)
     session = Session()
-    ch_client = get_clickhouse_client(
+    return engine, session
+
+
+def connect_clickhouse():
+    return get_clickhouse_client(
+        host=CH_HOST,
+        port=CH_PORT,
+        username=CH_USER,
+        password=CH_PASSWORD,
+    )
+
+
+async def connect_clickhouse_async():
+    return await get_async_clickhouse_client(
         host=CH_HOST,
         port=CH_PORT,
         username=CH_USER,
         password=CH_PASSWORD,
     )
-    return engine, session, ch_client
+
+
+async def monitor_async(
+    supervisor, session, scheduler, shards, triggers, tracker, aggregates
+):
+    async def cycle(ch_client):
+        if shards is not None:
+            shards.rebalance()
+        await process_runs_async(
+            session,
+            ch_client,
+            smtp_config=SMTP_CONFIG,
+            grace=MONITOR_CONFIG["grace"],
+            scheduler=scheduler,
+            shards=shards,
+            triggers=triggers,
+            heartbeats=MONITOR_CONFIG["heartbeats"],
+            concurrency=MONITOR_CONFIG["concurrency"],
+            chunk_size=MONITOR_CONFIG["batch_size"],
+            tracker=tracker,
+            aggregates=aggregates,
+        )
+
+    try:
+        while True:
+            start_time = time.perf_counter()
+            await supervisor.run_async(cycle)
+            duration = time.perf_counter() - start_time
+            record_cycle(duration, MONITOR_CONFIG["interval"])
+            await asyncio.sleep(
+                max(supervisor.delay(), MONITOR_CONFIG["interval"] - duration)
+            )
+    finally:
+        if supervisor.ch_client is not None:
+            await supervisor.ch_client.close()
 
 
 if __name__ == "__main__":
+    engine = session = shards = tracker = supervisor = dispatcher = None
     try:
-        engine, session, ch_client = start()
+        engine, session = start()
+        if OUTBOX_CONFIG["dispatch"]:
+            dispatcher = Dispatcher(
+                sessionmaker(bind=engine),
+                SMTP_CONFIG,
+                batch_size=OUTBOX_CONFIG["batch_size"],
+                max_attempts=OUTBOX_CONFIG["max_attempts"],
+                backoff=OUTBOX_CONFIG["backoff"],
+                retention_days=OUTBOX_CONFIG["retention_days"],
+                digest_window=ALERT_CONFIG["digest_window"],
+            )
+            dispatcher.start(OUTBOX_CONFIG["interval"])
+        if MONITOR_CONFIG["metrics_port"]:
+            serve_metrics(MONITOR_CONFIG["metrics_port"])
+        scheduler = (
+            RunScheduler(
+                grace=MONITOR_CONFIG["grace"], interval=MONITOR_CONFIG["interval"]
+            )
+            if MONITOR_CONFIG["scheduler"]
+            else None
+        )
+        shards = (
+            ShardLease(engine, shards=MONITOR_CONFIG["shards"])
+            if MONITOR_CONFIG["shards"] and engine.dialect.name == "postgresql"
+            else None
+        )
+        if MONITOR_CONFIG["listen"] and engine.dialect.name == "postgresql":
+            tracker = RunTracker(
+                engine, reconcile_interval=MONITOR_CONFIG["reconcile_interval"]
+            )
+            # tracked runs are kept loaded across commits
+            session.expire_on_commit = False
+        aggregates = Aggregates() if MONITOR_CONFIG["aggregates"] else None
+        triggers = TriggerCache()
+        tail = MetricTail() if MONITOR_CONFIG["tail"] else None
+        recipients.ttl = MONITOR_CONFIG["recipients_ttl"]
+        dedup.window = ALERT_CONFIG["dedup_window"]
+        fairness = FairQueue(
+            budget=MONITOR_CONFIG["budget"], batch_size=MONITOR_CONFIG["batch_size"]
+        )
+        supervisor = Supervisor(
+            session,
+            connect_clickhouse_async
+            if MONITOR_CONFIG["engine"] == "async"
+            else connect_clickhouse,
+            base=MONITOR_CONFIG["backoff"],
+            cap=MONITOR_CONFIG["backoff_cap"],
+            tracker=tracker,
+        )
+        if MONITOR_CONFIG["engine"] == "async":
+            # process_runs_async re-reads all metrics and checks every run each cycle
+            if MONITOR_CONFIG["tail"]:
+                print("MONITOR_TAIL is not supported by the async engine, ignoring")
+            if MONITOR_CONFIG["budget"]:
+                print("MONITOR_BUDGET is not supported by the async engine, ignoring")
+            asyncio.run(
+                monitor_async(
+                    supervisor,
+                    session,
+                    scheduler,
+                    shards,
+                    triggers,
+                    tracker,
+                    aggregates,
+                )
+            )
+
+        def cycle(ch_client):
+            if shards is not None:
+                shards.rebalance()
+            process_runs(
+                session,
+                ch_client,
+                smtp_config=SMTP_CONFIG,
+                grace=MONITOR_CONFIG["grace"],
+                scheduler=scheduler,
+                shards=shards,
+                triggers=triggers,
+                tail=tail,
+                heartbeats=MONITOR_CONFIG["heartbeats"],
+                fairness=fairness,
+                tracker=tracker,
+                aggregates=aggregates,
+            )
+
         while True:
-            process_runs(session, ch_client, smtp_config=SMTP_CONFIG)
-            time.sleep(10)
+            start_time = time.perf_counter()
+            supervisor.run(cycle)
+            duration = time.perf_counter() - start_time
+            record_cycle(duration, MONITOR_CONFIG["interval"])
+            time.sleep(max(supervisor.delay(), MONITOR_CONFIG["interval"] - duration))
     except Exception as err:
         print("Processing failed:", err)
     finally:
-        session.close()
-        engine.dispose()
+        # cycle errors are handled by the supervisor; only errors outside of
+        # it, e.g. at startup, get here
+        if dispatcher is not None:
+            dispatcher.stop()
+        if shards is not None:
+            shards.release()
+        if tracker is not None:
+            tracker.close()
+        if supervisor is not None and supervisor.ch_client is not None:
+            if MONITOR_CONFIG["engine"] != "async":
+                supervisor.ch_client.close()
+        if session is not None:
+            session.close()
+        if engine is not None:
+            engine.dispose()
+        time.sleep(MONITOR_CONFIG["interval"])
         print("Restarting script...")
         os.execv(sys.executable, [sys.executable] + sys.argv)
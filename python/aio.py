@@ -0,0 +1,155 @@
+import asyncio
+
+from python.clickhouse import RUN_METRIC_SUMMARY, tables_query
+from python.metrics import metrics
+from python.notifications import alerts
+from python.server import (
+    apply_threshold_rows,
+    apply_window_rows,
+    check_run_times,
+    get_recent_heartbeats,
+    get_running_runs,
+    last_update_query,
+    last_update_rows,
+    merge_heartbeats,
+    remap_rows,
+    split_summary_rows,
+    summary_threshold_query,
+    threshold_query,
+    write_statuses,
+)
+from python.triggers import TriggerCache, window_query
+
+
+async def process_runs_async(
+    session,
+    ch_client,
+    smtp_config,
+    grace=120,
+    scheduler=None,
+    shards=None,
+    triggers=None,
+    heartbeats=False,
+    concurrency=32,
+    chunk_size=100,
+    tracker=None,
+    aggregates=None,
+):
+    """asyncio variant of process_runs for an async ClickHouse client.
+
+    Runs are split into chunks of `chunk_size`, and the staleness and
+    threshold queries of every chunk are in flight together, bounded by a
+    semaphore of `concurrency` queries. With `heartbeats`, runs with a recent
+    heartbeat skip the staleness query, as in get_last_seen. Results are
+    applied afterwards in run order on the calling task, so status changes and
+    alerts are written in the same order as the synchronous loop.
+    """
+    if triggers is None:
+        triggers = TriggerCache()
+    checked = get_running_runs(session, scheduler, shards, triggers, tracker)
+    recent, beats = (
+        get_recent_heartbeats(session, checked, grace) if heartbeats else ({}, {})
+    )
+    chunks = [checked[i : i + chunk_size] for i in range(0, len(checked), chunk_size)]
+    semaphore = asyncio.Semaphore(concurrency)
+    if aggregates is not None and aggregates.due():
+        rows = await query(ch_client, semaphore, *tables_query())
+        aggregates.update({row[0] for row in rows or []})
+    results = await asyncio.gather(
+        *(
+            check_chunk(ch_client, semaphore, chunk, triggers, recent, aggregates)
+            for chunk in chunks
+        )
+    )
+
+    metrics.inc("monitor_runs_checked_total", len(checked))
+    last_seen = {}
+    for chunk, (chunk_last_seen, *_) in zip(chunks, results):
+        chunk_last_seen = merge_heartbeats(
+            {run.id: recent[run.id] for run in chunk if run.id in recent},
+            chunk_last_seen or {},
+            beats,
+        )
+        check_run_times(
+            session,
+            ch_client,
+            smtp_config,
+            [run for run in chunk if run.id in chunk_last_seen],
+            grace,
+            chunk_last_seen,
+        )
+        last_seen.update(chunk_last_seen)
+    for _, rules, rows, _, _ in results:
+        if rows is not None:
+            apply_threshold_rows(session, smtp_config, rules, rows)
+    for *_, window_rules, window_rows in results:
+        if window_rows is not None:
+            apply_window_rows(session, smtp_config, window_rules, window_rows)
+    if scheduler is not None:
+        scheduler.reschedule(checked, last_seen)
+
+    with metrics.time("monitor_phase_seconds", phase="postgres_write"):
+        try:
+            write_statuses(session)
+            alerts.flush(session, commit=False)
+            session.commit()
+        except Exception:
+            alerts.restore()
+            raise
+        alerts.confirm()
+    print("All updates saved to the database.")
+
+
+async def check_chunk(ch_client, semaphore, runs, triggers, recent, aggregates=None):
+    rules = triggers.rules(runs)
+    window_rules = triggers.window_rules(runs)
+    fallback = [run for run in runs if run.id not in recent]
+    last_seen_rows, threshold_rows, window_rows = await asyncio.gather(
+        query(ch_client, semaphore, *last_update_query(fallback, aggregates))
+        if fallback
+        else asyncio.sleep(0, result=[]),
+        get_threshold_rows(ch_client, semaphore, rules, aggregates),
+        query(ch_client, semaphore, *window_query(window_rules))
+        if window_rules
+        else asyncio.sleep(0, result=[]),
+    )
+    last_seen = (
+        last_update_rows(fallback, last_seen_rows)
+        if last_seen_rows is not None
+        else None
+    )
+    return last_seen, rules, threshold_rows, window_rules, window_rows
+
+
+async def get_threshold_rows(ch_client, semaphore, rules, aggregates=None):
+    """Async server.get_threshold_rows; None if a query failed."""
+    if not rules:
+        return []
+    if aggregates is None or RUN_METRIC_SUMMARY not in aggregates:
+        return await query(ch_client, semaphore, *threshold_query(rules))
+
+    summary_rows = await query(ch_client, semaphore, *summary_threshold_query(rules))
+    if summary_rows is None:
+        return None
+    rows, pending = split_summary_rows(summary_rows)
+    if pending:
+        raw_rows = await query(
+            ch_client, semaphore, *threshold_query([rules[idx] for idx in pending])
+        )
+        if raw_rows is None:
+            return None
+        rows.extend(remap_rows(pending, raw_rows))
+    return rows
+
+
+async def query(ch_client, semaphore, ch_query, ch_params):
+    async with semaphore:
+        metrics.inc("monitor_clickhouse_queries_total")
+        try:
+            with metrics.time("monitor_phase_seconds", phase="clickhouse"):
+                result = await ch_client.query(ch_query, parameters=ch_params)
+        except Exception as e:
+            metrics.inc("monitor_clickhouse_errors_total")
+            print(f"Error querying ClickHouse: {e}")
+            return None
+    return result.result_rows
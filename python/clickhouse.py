@@ -0,0 +1,174 @@
+import sys
+import time
+
+RUN_LAST_SEEN = "run_last_seen"
+RUN_METRIC_SUMMARY = "run_metric_summary"
+
+# name -> (columns/states selected from mlop_metrics, ORDER BY key, verify query)
+AGGREGATES = {
+    RUN_LAST_SEEN: (
+        "tenantId, projectName, runId, maxState(time) AS lastSeen",
+        "tenantId, projectName, runId",
+        """
+        SELECT count(), countIf(m.last_seen != v.last_seen)
+        FROM (
+            SELECT tenantId, projectName, runId, max(time) AS last_seen
+            FROM mlop_metrics
+            WHERE time >= now() - INTERVAL %(hours)s HOUR
+            GROUP BY tenantId, projectName, runId
+        ) AS m
+        LEFT JOIN (
+            SELECT tenantId, projectName, runId, maxMerge(lastSeen) AS last_seen
+            FROM run_last_seen
+            GROUP BY tenantId, projectName, runId
+        ) AS v USING (tenantId, projectName, runId)
+        """,
+    ),
+    RUN_METRIC_SUMMARY: (
+        """
+        tenantId, projectName, runId, logName,
+        minStateIf(value, NOT isNaN(value)) AS minValue,
+        maxStateIf(value, NOT isNaN(value)) AS maxValue,
+        argMaxState(value, time) AS lastValue,
+        maxState(time) AS lastTime
+        """,
+        "tenantId, projectName, runId, logName",
+        """
+        SELECT
+            count(),
+            countIf(
+                m.min_value != s.min_value
+                OR m.max_value != s.max_value
+                OR m.last_time != s.last_time
+            )
+        FROM (
+            SELECT
+                tenantId, projectName, runId, logName,
+                minIf(value, NOT isNaN(value)) AS min_value,
+                maxIf(value, NOT isNaN(value)) AS max_value,
+                max(time) AS last_time
+            FROM mlop_metrics
+            WHERE (tenantId, projectName, runId, logName) IN (
+                SELECT tenantId, projectName, runId, logName
+                FROM mlop_metrics
+                WHERE time >= now() - INTERVAL %(hours)s HOUR
+            )
+            GROUP BY tenantId, projectName, runId, logName
+        ) AS m
+        LEFT JOIN (
+            SELECT
+                tenantId, projectName, runId, logName,
+                minMerge(minValue) AS min_value,
+                maxMerge(maxValue) AS max_value,
+                maxMerge(lastTime) AS last_time
+            FROM run_metric_summary
+            GROUP BY tenantId, projectName, runId, logName
+        ) AS s USING (tenantId, projectName, runId, logName)
+        """,
+    ),
+}
+
+
+def setup(ch_client, names=None):
+    """Create the aggregate tables and the materialized views feeding them.
+
+    A table is backfilled from mlop_metrics only when it is created; the
+    view is created first, so rows inserted during the backfill may be
+    aggregated twice, which min/max/argMax states absorb.
+    """
+    existing = get_tables(ch_client)
+    for name in names or AGGREGATES:
+        select, key, _ = AGGREGATES[name]
+        query = f"SELECT {select} FROM mlop_metrics GROUP BY {key}"
+        ch_client.command(
+            f"CREATE TABLE IF NOT EXISTS {name} "
+            f"ENGINE = AggregatingMergeTree ORDER BY ({key}) EMPTY AS {query}"
+        )
+        ch_client.command(
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name}_mv TO {name} AS {query}"
+        )
+        if name in existing:
+            print(f"{name} already exists")
+            continue
+        print(f"Backfilling {name} from mlop_metrics")
+        ch_client.command(f"INSERT INTO {name} {query}")
+
+
+def verify(ch_client, names=None, hours=24):
+    """Compare each aggregate against mlop_metrics for keys seen in `hours`.
+
+    Returns a dict of table name to (keys checked, keys that differ).
+    """
+    results = {}
+    for name in names or AGGREGATES:
+        result = ch_client.query(AGGREGATES[name][2], parameters={"hours": hours})
+        checked, mismatched = result.result_rows[0]
+        print(f"{name}: {mismatched} of {checked} keys differ from mlop_metrics")
+        results[name] = (checked, mismatched)
+    return results
+
+
+def get_tables(ch_client):
+    result = ch_client.query(*tables_query())
+    return {row[0] for row in result.result_rows}
+
+
+def tables_query():
+    ch_query = """
+        SELECT name FROM system.tables
+        WHERE database = currentDatabase() AND name IN %(names)s
+    """
+    return ch_query, {"names": tuple(AGGREGATES)}
+
+
+class Aggregates:
+    """Which aggregate tables exist, re-checked at most every `ttl` seconds.
+
+    Queries read an aggregate only when it is present here, so the monitor
+    keeps working against the raw table until `setup` has been run.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.tables = set()
+        self._checked = None
+
+    def __contains__(self, name):
+        return name in self.tables
+
+    def due(self):
+        return self._checked is None or time.monotonic() - self._checked >= self.ttl
+
+    def refresh(self, ch_client):
+        if not self.due():
+            return self.tables
+        try:
+            self.update(get_tables(ch_client))
+        except Exception as e:
+            print(f"Error listing ClickHouse aggregate tables: {e}")
+            self.update(set())
+        return self.tables
+
+    def update(self, tables):
+        if tables != self.tables:
+            print(f"Using ClickHouse aggregate tables: {sorted(tables) or 'none'}")
+        self.tables = set(tables)
+        self._checked = time.monotonic()
+
+
+if __name__ == "__main__":
+    from clickhouse_connect import get_client
+    from dotenv import load_dotenv
+
+    from python.env import get_clickhouse_config
+
+    load_dotenv()
+    if len(sys.argv) < 2 or sys.argv[1] not in ["setup", "verify"]:
+        print("Usage: python -m python.clickhouse setup|verify [table ...]")
+        sys.exit(1)
+    ch_client = get_client(**get_clickhouse_config())
+    names = sys.argv[2:] or None
+    if sys.argv[1] == "setup":
+        setup(ch_client, names)
+    results = verify(ch_client, names)
+    sys.exit(1 if any(mismatched for _, mismatched in results.values()) else 0)
@@ -0,0 +1,70 @@
+import threading
+import time
+
+from python.metrics import metrics
+
+
+class AlertDedup:
+    """Suppresses repeats of an alert within `window` seconds.
+
+    Alerts are keyed by (organization, run, alert type, title), so a run that
+    keeps reporting the same condition, e.g. a client posting the same alert
+    on every step, produces one notification and one round of emails per
+    window. Alerts for other runs, of another type or with another title are
+    unaffected; their emails are coalesced into digests by the outbox
+    Dispatcher instead.
+
+    An admitted key is pending until commit(), called once the alert's rows
+    are committed, and stops suppressing repeats if it is release()d
+    because the rows were dropped. Repeats of a pending key are suppressed.
+    """
+
+    def __init__(self, window=600):
+        self.window = window
+        self._seen = {}  # (organization id, run id, type, title) -> monotonic time
+        self._pending = set()  # keys admitted but not committed
+        self._pruned = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def clear(self):
+        with self._lock:
+            self._seen, self._pending = {}, set()
+
+    def admit(self, organization_id, run_id, level, title):
+        """The alert's key if it should be delivered, None if it is a repeat."""
+        key = (organization_id, run_id, level, title)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned >= self.window:
+                self._seen = {
+                    key: seen
+                    for key, seen in self._seen.items()
+                    if now - seen < self.window
+                }
+                self._pruned = now
+            seen = self._seen.get(key)
+            if key in self._pending or (seen is not None and now - seen < self.window):
+                metrics.inc("monitor_alerts_suppressed_total", level=level)
+                return None
+            self._pending.add(key)
+        return key
+
+    def commit(self, keys):
+        """Start the window of `keys`, whose alerts were committed."""
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._pending.discard(key)
+                self._seen[key] = now
+
+    def release(self, keys):
+        """Forget `keys`, whose alerts were not written."""
+        with self._lock:
+            for key in keys:
+                self._pending.discard(key)
+
+
+dedup = AlertDedup()
@@ -2,25 +2,181 @@ import email
 import imaplib
 import logging
 import smtplib
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from email.charset import QP, Charset
 from email.header import decode_header
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
+from python.metrics import metrics
+
 TAG = "Emails"
 
+# mostly-ASCII bodies are about a third smaller quoted-printable than base64
+UTF8_QP = Charset("utf-8")
+UTF8_QP.body_encoding = QP
+RATE_WINDOW = 60  # seconds over which smtp_sends_per_second is averaged
+
+# errors the server answered with; the connection itself is still usable
+REFUSED = (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class SMTPPool:
+    """A small pool of logged-in SMTP connections reused across messages.
+
+    Connections are opened on demand, up to `size` at a time, and closed
+    after `idle_timeout` seconds unused. A message that fails on a reused
+    connection, e.g. because the server dropped it, is retried once on a new
+    one, so the STARTTLS and login handshake is paid once per connection
+    instead of once per recipient.
+    """
+
+    def __init__(self, config, size=2, idle_timeout=60, timeout=30):
+        self.config = config
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []  # (connection, time returned to the pool)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._sent = deque()  # send times within the last RATE_WINDOW
+
+    def send(self, from_address, to_address, message):
+        try:
+            self._send(from_address, to_address, message)
+        except Exception:
+            # every caller, the outbox dispatcher included, is counted here
+            metrics.inc("smtp_errors_total")
+            raise
+
+    def _send(self, from_address, to_address, message):
+        with self._slots:
+            for attempt in range(2):
+                server, reused = self._acquire()
+                start = time.perf_counter()
+                try:
+                    server.sendmail(from_address, to_address, message)
+                except REFUSED:
+                    self._release(server)
+                    raise
+                except OSError:  # includes SMTPServerDisconnected
+                    self._close(server)
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                self._release(server)
+                self._record(time.perf_counter() - start)
+                return
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._close(server)
+
+    def _acquire(self):
+        expired = []
+        server = None
+        with self._lock:
+            now = time.monotonic()
+            while self._idle:
+                candidate, returned = self._idle.pop()
+                if now - returned < self.idle_timeout:
+                    server = candidate
+                    break
+                expired.append(candidate)
+        for candidate in expired:
+            self._close(candidate)
+        if server is not None:
+            return server, True
+        return self._connect(), False
+
+    def _connect(self):
+        server = smtplib.SMTP(
+            self.config["server"], self.config["port"], timeout=self.timeout
+        )
+        try:
+            server.starttls()
+            server.login(self.config["username"], self.config["password"])
+        except Exception:
+            self._close(server)
+            raise
+        metrics.inc("smtp_connects_total")
+        return server
+
+    def _release(self, server):
+        with self._lock:
+            self._idle.append((server, time.monotonic()))
+
+    def _close(self, server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _record(self, seconds):
+        now = time.monotonic()
+        with self._lock:
+            self._sent.append(now)
+            while self._sent[0] < now - RATE_WINDOW:
+                self._sent.popleft()
+            rate = len(self._sent) / RATE_WINDOW
+        metrics.inc("smtp_sends_total")
+        metrics.observe("smtp_send_seconds", seconds)
+        metrics.set("smtp_sends_per_second", rate)
+
+
+def get_smtp_pool(config):
+    """The shared SMTPPool for the server and account in `config`."""
+    key = (config["server"], config["port"], config["username"])
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = SMTPPool(config, size=int(config.get("pool_size", 2)))
+        return _pools[key]
 
-def send_email(config, from_address, to_address, subject, body, html=False):
-    email = MIMEMultipart()
+
+def build_email(from_address, to_address, subject, body, html=False, text=None):
+    """The message as a string; an HTML `body` with a plain `text` version is
+    sent as multipart/alternative.
+
+    The encoded message is cached without its To header, so an alert sent to
+    every member of an organization is encoded once, not once per member.
+    """
+    if not to_address.isascii():
+        return _encode(from_address, to_address, subject, body, html, text)
+    return f"To: {to_address}\n" + _encode(
+        from_address, None, subject, body, html, text
+    )
+
+
+@lru_cache(maxsize=32)
+def _encode(from_address, to_address, subject, body, html, text):
+    if html and text is not None:
+        email = MIMEMultipart("alternative")
+        email.attach(MIMEText(text, "plain", UTF8_QP))
+        email.attach(MIMEText(body, "html", UTF8_QP))
+    else:
+        email = MIMEText(body, "html" if html else "plain", UTF8_QP)
     email["From"] = from_address
-    email["To"] = to_address
+    if to_address is not None:
+        email["To"] = to_address
     email["Subject"] = subject
-    email.attach(MIMEText(body, "html" if html else "plain"))
+    return email.as_string()
+
 
+def send_email(config, from_address, to_address, subject, body, html=False, text=None):
     try:
-        with smtplib.SMTP(config["server"], config["port"]) as server:
-            server.starttls()
-            server.login(config["username"], config["password"])
-            server.sendmail(from_address, to_address, email.as_string())
+        get_smtp_pool(config).send(
+            from_address,
+            to_address,
+            build_email(from_address, to_address, subject, body, html, text),
+        )
         print("Email sent successfully!")
     except Exception as e:
         print(f"Failed to send email: {e}")
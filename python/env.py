@@ -9,6 +9,7 @@ def get_smtp_config():
         "password": os.getenv("SMTP_PASSWORD", ""),
         "from_address": os.getenv("SMTP_FROM_ADDRESS", ""),
         "app_host": os.getenv("APP_HOST", "localhost"),
+        "pool_size": int(os.getenv("SMTP_POOL_SIZE", 2)),
     }
 
 def get_imap_config():
@@ -19,5 +20,73 @@ def get_imap_config():
         "password": os.getenv("IMAP_PASSWORD", ""),
     }
 
+def get_monitor_config():
+    return {
+        "grace": int(os.getenv("MONITOR_GRACE", 120)),
+        "interval": int(os.getenv("MONITOR_INTERVAL", 10)),
+        "scheduler": os.getenv("MONITOR_SCHEDULER", "1") == "1",
+        "shards": int(os.getenv("MONITOR_SHARDS", 0)),
+        "engine": os.getenv("MONITOR_ENGINE", "sync"),
+        "tail": os.getenv("MONITOR_TAIL", "0") == "1",
+        "concurrency": int(os.getenv("MONITOR_CONCURRENCY", 32)),
+        "heartbeats": os.getenv("MONITOR_HEARTBEATS", "1") == "1",
+        "budget": float(os.getenv("MONITOR_BUDGET", 0)),
+        "batch_size": int(os.getenv("MONITOR_BATCH_SIZE", 500)),
+        "metrics_port": int(os.getenv("MONITOR_METRICS_PORT", 0)),
+        "listen": os.getenv("MONITOR_LISTEN", "0") == "1",
+        "reconcile_interval": int(os.getenv("MONITOR_RECONCILE_INTERVAL", 300)),
+        "aggregates": os.getenv("MONITOR_AGGREGATES", "1") == "1",
+        "backoff": float(os.getenv("MONITOR_BACKOFF", 1)),
+        "backoff_cap": float(os.getenv("MONITOR_BACKOFF_CAP", 300)),
+        "recipients_ttl": int(os.getenv("MONITOR_RECIPIENTS_TTL", 300)),
+    }
+
+def get_heartbeat_config():
+    return {
+        "flush_interval": int(os.getenv("HEARTBEAT_FLUSH_INTERVAL", 5)),
+        "auth_ttl": int(os.getenv("HEARTBEAT_AUTH_TTL", 60)),
+    }
+
+def get_outbox_config():
+    return {
+        "dispatch": os.getenv("OUTBOX_DISPATCH", "1") == "1",
+        "interval": float(os.getenv("OUTBOX_INTERVAL", 1)),
+        "batch_size": int(os.getenv("OUTBOX_BATCH_SIZE", 100)),
+        "max_attempts": int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5)),
+        "backoff": float(os.getenv("OUTBOX_BACKOFF", 30)),
+        "retention_days": float(os.getenv("OUTBOX_RETENTION_DAYS", 7)),
+    }
+
+def get_alert_config():
+    return {
+        "dedup_window": int(os.getenv("ALERT_DEDUP_WINDOW", 600)),
+        "digest_window": int(os.getenv("ALERT_DIGEST_WINDOW", 60)),
+        "buffer_size": int(os.getenv("ALERT_BUFFER_SIZE", 500)),
+        "flush_interval": float(os.getenv("ALERT_FLUSH_INTERVAL", 1)),
+    }
+
+def get_webhook_config():
+    return {
+        "secret": os.getenv("WEBHOOK_SECRET", ""),
+        "per_host": int(os.getenv("WEBHOOK_HOST_CONCURRENCY", 4)),
+        "retries": int(os.getenv("WEBHOOK_RETRIES", 3)),
+        "backoff": float(os.getenv("WEBHOOK_BACKOFF", 1)),
+        "timeout": float(os.getenv("WEBHOOK_TIMEOUT", 10)),
+        "allowed_hosts": [
+            host.strip()
+            for host in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",")
+            if host.strip()
+        ],
+    }
+
+def get_clickhouse_config():
+    url = os.getenv("CLICKHOUSE_URL", "url")
+    return {
+        "host": url.split("://")[1].split(":")[0],
+        "port": url.split("://")[1].split(":")[1],
+        "username": os.getenv("CLICKHOUSE_USER", "user"),
+        "password": os.getenv("CLICKHOUSE_PASSWORD", "password"),
+    }
+
 def get_database_url():
     return os.getenv("DATABASE_DIRECT_URL")
@@ -0,0 +1,188 @@
+import sys
+import time
+
+from sqlalchemy.orm import joinedload
+
+from python.metrics import metrics
+from python.models import Run, RunStatus
+
+CHANNEL = "mlop_runs"
+
+NOTIFY_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION mlop_notify_run() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP <> 'UPDATE'
+            OR NEW.status IS DISTINCT FROM OLD.status
+            OR NEW."loggerSettings"::text IS DISTINCT FROM OLD."loggerSettings"::text
+        THEN
+            PERFORM pg_notify('{CHANNEL}', COALESCE(NEW.id, OLD.id)::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS mlop_notify_run ON runs",
+    """
+    CREATE TRIGGER mlop_notify_run
+    AFTER INSERT OR UPDATE OR DELETE ON runs
+    FOR EACH ROW EXECUTE FUNCTION mlop_notify_run()
+    """,
+]
+
+
+def setup(engine):
+    """Install the notification trigger on runs; run once per database with
+    `python -m python.listen setup`."""
+    with engine.begin() as conn:
+        for statement in NOTIFY_DDL:
+            conn.exec_driver_sql(statement)
+    print("Installed run notification trigger")
+
+
+def installed(conn):
+    return (
+        conn.exec_driver_sql(
+            "SELECT 1 FROM pg_trigger "
+            "WHERE tgname = 'mlop_notify_run' AND tgrelid = 'runs'::regclass"
+        ).first()
+        is not None
+    )
+
+
+class RunTracker:
+    """The RUNNING set kept in memory and updated through LISTEN/NOTIFY.
+
+    A trigger on runs notifies CHANNEL with the run id on every insert,
+    delete, status change and loggerSettings change; it is installed by
+    setup(), not by the monitor. Each cycle the pending notifications are
+    drained without blocking and only those runs are re-read. The full set is re-read every `reconcile_interval` seconds, after
+    the listening connection is lost and when the shard assignment changes,
+    so a missed notification costs at most one reconcile interval. Without
+    the trigger the full set is re-read every cycle.
+
+    The runs stay attached to the monitor's session between cycles, so the
+    session must not expire them on commit (expire_on_commit=False).
+    """
+
+    def __init__(self, engine, reconcile_interval=300):
+        self.engine = engine
+        self.reconcile_interval = reconcile_interval
+        self.runs = {}  # run id -> Run
+        self._conn = None
+        self._owned = None
+        self._reconciled = None
+        self._missing = False
+
+    def sync(self, session, shards=None):
+        """Apply pending changes and return the RUNNING runs."""
+        owned = list(shards.owned) if shards is not None else None
+        try:
+            listening = self._listen()
+            changed = self._poll()
+        except Exception as e:
+            print(f"Run notification connection lost: {e}")
+            self.close()
+            listening, changed = False, None
+
+        if (
+            not listening
+            or changed is None
+            or owned != self._owned
+            or self._reconciled is None
+            or time.monotonic() - self._reconciled >= self.reconcile_interval
+        ):
+            self.reconcile(session, shards)
+            self._owned = owned
+        elif changed:
+            self.refresh(session, changed, shards)
+
+        # runs this monitor moved out of RUNNING since the last cycle
+        for run_id in [
+            i for i, run in self.runs.items() if run.status != RunStatus.RUNNING
+        ]:
+            del self.runs[run_id]
+        return list(self.runs.values())
+
+    def reconcile(self, session, shards=None):
+        runs = self._query(session, shards).filter(Run.status == "RUNNING").all()
+        self.runs = {run.id: run for run in runs}
+        self._reconciled = time.monotonic()
+        metrics.inc("monitor_run_reconciles_total")
+        print(f"Reconciled {len(runs)} running runs")
+
+    def refresh(self, session, run_ids, shards=None):
+        run_ids = list(run_ids)
+        runs = {
+            run.id: run
+            for run in self._query(session, shards).filter(Run.id.in_(run_ids)).all()
+        }
+        for run_id in run_ids:
+            run = runs.get(run_id)
+            if run is not None and run.status == RunStatus.RUNNING:
+                self.runs[run_id] = run
+            else:
+                self.runs.pop(run_id, None)
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception as e:
+                print(f"Error closing run notification connection: {e}")
+        self._conn = None
+
+    def _query(self, session, shards):
+        query = (
+            session.query(Run)
+            .options(joinedload(Run.project), joinedload(Run.organization))
+            .populate_existing()
+        )
+        if shards is not None:
+            query = query.filter(shards.clause(Run.id))
+        return query
+
+    def _listen(self):
+        """Returns False when the connection was (re)opened this cycle or the
+        trigger is not installed."""
+        if self._conn is not None and not self._conn.closed:
+            return True
+        self._conn = self.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        )
+        if not installed(self._conn):
+            if not self._missing:
+                print(
+                    "Run notification trigger is not installed, polling all runs; "
+                    "install it with `python -m python.listen setup`"
+                )
+            self._missing = True
+            self.close()
+            return False
+        self._missing = False
+        self._conn.exec_driver_sql(f"LISTEN {CHANNEL}")
+        return False
+
+    def _poll(self):
+        if self._conn is None:
+            return None
+        dbapi_conn = self._conn.connection.dbapi_connection
+        dbapi_conn.poll()
+        changed = set()
+        while dbapi_conn.notifies:
+            changed.add(int(dbapi_conn.notifies.pop(0).payload))
+        metrics.inc("monitor_run_notifications_total", len(changed))
+        return changed
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+
+    from python.env import get_database_url
+
+    load_dotenv()
+    if len(sys.argv) != 2 or sys.argv[1] != "setup":
+        print("Usage: python -m python.listen setup")
+        sys.exit(1)
+    setup(create_engine(get_database_url()))
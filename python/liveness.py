@@ -0,0 +1,106 @@
+import sys
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from python.metrics import metrics
+from python.models import RunHeartbeat
+
+TABLES = [RunHeartbeat.__table__]
+
+
+def setup(engine):
+    """Create run_heartbeats; run once per database with
+    `python -m python.liveness setup`."""
+    RunHeartbeat.metadata.create_all(engine, tables=TABLES)
+    print("Created the run_heartbeats table")
+
+
+class LivenessTable:
+    """In-process table of the latest client heartbeat per run.
+
+    Heartbeats are cheap in-memory writes; flush() upserts everything received
+    since the previous flush into run_heartbeats in one statement, where the
+    monitor reads it with get_heartbeats.
+    """
+
+    def __init__(self):
+        self._beats = {}  # run id -> latest heartbeat time
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._beats)
+
+    def beat(self, run_id, time=None):
+        time = time or datetime.now(timezone.utc)
+        with self._lock:
+            if run_id not in self._beats or self._beats[run_id] < time:
+                self._beats[run_id] = time
+
+    def flush(self, session):
+        with self._lock:
+            beats, self._beats = self._beats, {}
+        if not beats:
+            return 0
+
+        insert = (
+            postgresql.insert
+            if session.get_bind().dialect.name == "postgresql"
+            else sqlite.insert
+        )
+        stmt = insert(RunHeartbeat).values(
+            [{"runId": run_id, "lastSeen": time} for run_id, time in beats.items()]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RunHeartbeat.runId],
+            set_={"lastSeen": stmt.excluded.lastSeen},
+        )
+        try:
+            session.execute(stmt)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Error flushing {len(beats)} heartbeats: {e}")
+            for run_id, time in beats.items():
+                self.beat(run_id, time)
+            return 0
+        return len(beats)
+
+
+def get_heartbeats(session, runs):
+    """Latest flushed heartbeat per run id for `runs`, in one query.
+
+    The read runs in a savepoint, so a failure does not roll back the status
+    changes the monitor has not written yet.
+    """
+    if not runs:
+        return {}
+    try:
+        with metrics.time("monitor_phase_seconds", phase="postgres_fetch"):
+            # a Connection savepoint: Session.begin_nested() would flush them
+            conn = session.connection()
+            with conn.begin_nested():
+                rows = conn.execute(
+                    select(RunHeartbeat.runId, RunHeartbeat.lastSeen).where(
+                        RunHeartbeat.runId.in_([run.id for run in runs])
+                    )
+                ).all()
+    except Exception as e:
+        print(f"Error retrieving heartbeats: {e}")
+        return {}
+    return {run_id: last_seen for run_id, last_seen in rows}
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+
+    from python.env import get_database_url
+
+    load_dotenv()
+    if len(sys.argv) != 2 or sys.argv[1] != "setup":
+        print("Usage: python -m python.liveness setup")
+        sys.exit(1)
+    setup(create_engine(get_database_url()))
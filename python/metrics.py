@@ -0,0 +1,114 @@
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Metrics:
+    """Thread-safe counters, gauges and summaries in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}  # (name, labels) -> value
+        self._summaries = {}  # (name, labels) -> [sum, count]
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.setdefault(key, [0.0, 0])
+            summary[0] += value
+            summary[1] += 1
+
+    @contextmanager
+    def time(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def get(self, name, **labels):
+        """Current value of a counter or gauge, or (sum, count) of a summary."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            if key in self._gauges:
+                return self._gauges[key]
+            if key in self._summaries:
+                return tuple(self._summaries[key])
+        return None
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for kind, values in [("counter", self._counters), ("gauge", self._gauges)]:
+                for name in sorted({name for name, _ in values}):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (n, labels), value in sorted(values.items()):
+                        if n == name:
+                            lines.append(f"{name}{_labels(labels)} {value}")
+            for name in sorted({name for name, _ in self._summaries}):
+                lines.append(f"# TYPE {name} summary")
+                for (n, labels), (total, count) in sorted(self._summaries.items()):
+                    if n == name:
+                        lines.append(f"{name}_sum{_labels(labels)} {total}")
+                        lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+metrics = Metrics()
+
+
+def record_cycle(duration, interval):
+    """Record one monitor cycle; returns True if it overran its interval."""
+    metrics.observe("monitor_cycle_seconds", duration)
+    metrics.set("monitor_cycle_last_seconds", duration)
+    metrics.set("monitor_cycle_last_timestamp", time.time())
+    metrics.inc("monitor_cycles_total")
+    if duration > interval:
+        metrics.inc("monitor_cycle_overruns_total")
+        print(f"Monitor cycle took {duration:.2f}s, over its {interval}s interval")
+        return True
+    return False
+
+
+def serve_metrics(port, registry=metrics):
+    """Serve `registry` at http://0.0.0.0:<port>/metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving monitor metrics on port {port}")
+    return server
@@ -7,6 +7,7 @@ from sqlalchemy import (
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     String,
 )
@@ -61,6 +62,15 @@ class Run(Base):
         )
 
 
+class RunHeartbeat(Base):
+    __tablename__ = "run_heartbeats"
+    runId = Column(Integer, ForeignKey("runs.id"), primary_key=True)
+    lastSeen = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<RunHeartbeat(runId={self.runId}, lastSeen={self.lastSeen})>"
+
+
 class Notification(Base):
     __tablename__ = "notifications"
     id = Column(Integer, primary_key=True)
@@ -80,6 +90,32 @@ class Notification(Base):
         )
 
 
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True)
+    toAddress = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(String, nullable=False)
+    html = Column(Boolean, nullable=False, default=False)
+    text = Column(String)  # plain-text alternative of an HTML body
+    summary = Column(String)  # one line for digests, None if not coalescable
+    url = Column(String)
+    status = Column(String, nullable=False, default="PENDING")
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String)
+    createdAt = Column(DateTime(timezone=True), server_default=func.now())
+    nextAttemptAt = Column(DateTime(timezone=True))
+    sentAt = Column(DateTime(timezone=True))
+
+    __table_args__ = (Index("email_outbox_pending", "status", "nextAttemptAt"),)
+
+    def __repr__(self):
+        return (
+            f"<EmailOutbox(id={self.id}, toAddress={self.toAddress}, "
+            f"status={self.status}, attempts={self.attempts})>"
+        )
+
+
 class User(Base):
     __tablename__ = "user"
 
@@ -0,0 +1,134 @@
+import threading
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from python.coalesce import dedup
+from python.metrics import metrics
+
+
+class AlertBuffer:
+    """Notification and outbox rows written with one INSERT per table on flush().
+
+    Rows a constraint rejects are dropped; a row's dedup key is committed
+    with it, or released if it is dropped.
+    """
+
+    def __init__(self, size=500, interval=1):
+        self.size = size
+        self.interval = interval
+        self._rows = {}  # model -> [(row values, dedup key)]
+        self._count = 0
+        self._oldest = None
+        self._flushed = []  # tables inserted with commit=False, not confirmed
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def add(self, model, dedup_key=None, **values):
+        with self._lock:
+            self._rows.setdefault(model, []).append((values, dedup_key))
+            self._count += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._rows, self._count, self._oldest = {}, 0, None
+        self._flushed = []
+
+    def full(self):
+        return self._count >= self.size
+
+    def due(self):
+        return self.full() or (
+            self._oldest is not None
+            and time.monotonic() - self._oldest >= self.interval
+        )
+
+    def flush(self, session, commit=True):
+        """Insert the buffered rows; returns the number written.
+
+        With commit=False the rows join the session's transaction and errors
+        propagate to the caller, which must call confirm() once it committed
+        or restore() if it did not. Otherwise they are committed, and on error
+        put back for the next flush.
+        """
+        with self._lock:
+            tables, self._rows = self._rows, {}
+            self._count, self._oldest = 0, None
+        if not tables:
+            return 0
+
+        if not commit:
+            self._flushed.append(tables)
+            return self._insert(session, tables)
+        try:
+            count = self._insert(session, tables)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Error flushing buffered alert rows: {e}")
+            self._put_back(tables)
+            return 0
+        self._commit_keys(tables)
+        return count
+
+    def confirm(self):
+        """The rows of flush(commit=False) were committed."""
+        flushed, self._flushed = self._flushed, []
+        for tables in flushed:
+            self._commit_keys(tables)
+
+    def restore(self):
+        """The rows of flush(commit=False) were rolled back; buffer them again."""
+        flushed, self._flushed = self._flushed, []
+        for tables in flushed:
+            self._put_back(tables)
+
+    def _put_back(self, tables):
+        for model, rows in tables.items():
+            for values, key in rows:
+                self.add(model, key, **values)
+
+    def _commit_keys(self, tables):
+        dedup.commit(
+            [key for rows in tables.values() for _, key in rows if key is not None]
+        )
+
+    def _insert(self, session, tables):
+        """Insert `tables`, removing the rows that were dropped from it."""
+        count = 0
+        with metrics.time("monitor_phase_seconds", phase="alert_flush"):
+            for model, rows in tables.items():
+                try:
+                    with session.begin_nested():
+                        session.execute(insert(model), [values for values, _ in rows])
+                except (DataError, IntegrityError):
+                    rows[:] = self._insert_rows(session, model, rows)
+                count += len(rows)
+                metrics.inc(
+                    "alert_rows_flushed_total", len(rows), table=model.__tablename__
+                )
+        return count
+
+    def _insert_rows(self, session, model, rows):
+        """Insert `rows` one at a time; returns the rows that were written."""
+        written = []
+        for values, key in rows:
+            try:
+                with session.begin_nested():
+                    session.execute(insert(model), [values])
+            except (DataError, IntegrityError) as e:
+                metrics.inc("alert_rows_dropped_total", table=model.__tablename__)
+                print(f"Dropping {model.__tablename__} row {values}: {e.orig}")
+                if key is not None:
+                    dedup.release([key])
+                continue
+            written.append((values, key))
+        return written
+
+
+alerts = AlertBuffer()
@@ -0,0 +1,269 @@
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_
+
+from python.emails import build_email, get_smtp_pool
+from python.metrics import metrics
+from python.models import EmailOutbox
+from python.notifications import alerts
+from python.templates import process_digest_email, process_digest_email_text
+from python.utils import to_utc
+
+TABLES = [EmailOutbox.__table__]
+
+PENDING = "PENDING"
+SENT = "SENT"
+FAILED = "FAILED"
+PURGE_INTERVAL = 3600
+
+
+def setup(engine):
+    """Create email_outbox; run once per database with
+    `python -m python.outbox setup`."""
+    EmailOutbox.metadata.create_all(engine, tables=TABLES)
+    print("Created the email_outbox table")
+
+
+def queue_email(
+    to_address, subject, body, html=False, text=None, summary=None, url=None
+):
+    """Add an email to the outbox; it is written with the next alert flush.
+
+    Emails with a `summary` may be merged with others to the same address
+    into one digest, listing each summary linked to its `url`.
+    """
+    alerts.add(
+        EmailOutbox,
+        toAddress=to_address,
+        subject=subject,
+        body=body,
+        html=html,
+        text=text,
+        summary=summary,
+        url=url,
+    )
+    metrics.inc("outbox_queued_total")
+
+
+class Dispatcher:
+    """Sends the emails queued in email_outbox, at least once, in batches.
+
+    Failed sends are retried with exponential backoff; with a `digest_window`,
+    later emails to an address are held and sent as one digest.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        smtp_config,
+        batch_size=100,
+        max_attempts=5,
+        backoff=30,
+        retention_days=7,
+        digest_window=0,
+    ):
+        self.session_factory = session_factory
+        self.smtp_config = smtp_config
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.retention_days = retention_days
+        self.digest_window = digest_window
+        self._stop = threading.Event()
+        self._thread = None
+
+    def drain(self):
+        """Send one batch of due emails; returns the number of rows handled."""
+        session = self.session_factory()
+        try:
+            now = datetime.now(timezone.utc)
+            query = session.query(EmailOutbox).filter(
+                EmailOutbox.status == PENDING,
+                or_(
+                    EmailOutbox.nextAttemptAt.is_(None),
+                    EmailOutbox.nextAttemptAt <= now,
+                ),
+            )
+            if self.digest_window:
+                cutoff = now - timedelta(seconds=self.digest_window)
+                recent = session.query(EmailOutbox.toAddress).filter(
+                    EmailOutbox.status == SENT, EmailOutbox.sentAt > cutoff
+                )
+                addresses = [
+                    address
+                    for (address,) in query.filter(
+                        or_(
+                            EmailOutbox.createdAt <= cutoff,
+                            EmailOutbox.toAddress.not_in(recent),
+                        )
+                    )
+                    .with_entities(EmailOutbox.toAddress)
+                    .distinct()
+                    .limit(self.batch_size)
+                ]
+                query = query.filter(EmailOutbox.toAddress.in_(addresses))
+            query = query.order_by(EmailOutbox.id).limit(self.batch_size)
+            if session.get_bind().dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True)
+            rows = query.all()
+
+            digests = {}  # address -> rows merged into one email
+            for row in rows:
+                if self.digest_window and row.summary is not None:
+                    digests.setdefault(row.toAddress, []).append(row)
+                else:
+                    self._send([row], row.subject, row.body, row.html, row.text)
+            for address, group in digests.items():
+                if len(group) == 1:
+                    row = group[0]
+                    self._send(group, row.subject, row.body, row.html, row.text)
+                    continue
+                metrics.inc("outbox_digests_total")
+                metrics.inc("outbox_coalesced_total", len(group))
+                items = [(row.summary, row.url) for row in group]
+                self._send(
+                    group,
+                    f"mlop: {len(group)} alerts",
+                    process_digest_email(items),
+                    True,
+                    process_digest_email_text(items),
+                )
+            session.commit()
+            metrics.set(
+                "outbox_pending",
+                session.query(EmailOutbox)
+                .filter(EmailOutbox.status == PENDING)
+                .count(),
+            )
+            return len(rows)
+        except Exception as e:
+            session.rollback()
+            print(f"Error dispatching queued emails: {e}")
+            return 0
+        finally:
+            session.close()
+
+    def purge(self):
+        """Delete sent and failed rows older than `retention_days`."""
+        session = self.session_factory()
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+            count = (
+                session.query(EmailOutbox)
+                .filter(
+                    EmailOutbox.status.in_([SENT, FAILED]),
+                    EmailOutbox.createdAt < cutoff,
+                )
+                .delete(synchronize_session=False)
+            )
+            session.commit()
+            metrics.inc("outbox_purged_total", count)
+            return count
+        except Exception as e:
+            session.rollback()
+            print(f"Error purging sent emails: {e}")
+            return 0
+        finally:
+            session.close()
+
+    def run(self, interval=1):
+        """Drain until stop(), waiting `interval` seconds when the queue is empty."""
+        purged = None
+        while not self._stop.is_set():
+            if purged is None or time.monotonic() - purged >= PURGE_INTERVAL:
+                self.purge()
+                purged = time.monotonic()
+            if self.drain() < self.batch_size:
+                self._stop.wait(interval)
+
+    def start(self, interval=1):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, args=(interval,), daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _send(self, rows, subject, body, html, text=None):
+        """Send one email for `rows`, all to the same address."""
+        address = rows[0].toAddress
+        for row in rows:
+            row.attempts += 1
+        try:
+            with metrics.time("outbox_send_seconds"):
+                get_smtp_pool(self.smtp_config).send(
+                    self.smtp_config["from_address"],
+                    address,
+                    build_email(
+                        self.smtp_config["from_address"],
+                        address,
+                        subject,
+                        body,
+                        html,
+                        text,
+                    ),
+                )
+        except Exception as e:
+            retry = datetime.now(timezone.utc) + timedelta(
+                seconds=self.backoff * 2 ** (rows[0].attempts - 1)
+            )
+            for row in rows:
+                row.error = str(e)
+                if row.attempts >= self.max_attempts:
+                    row.status = FAILED
+                    metrics.inc("outbox_failed_total")
+                else:
+                    row.nextAttemptAt = retry
+                    metrics.inc("outbox_retries_total")
+            print(f"Error sending email to {address}, attempt {rows[0].attempts}: {e}")
+            return
+        sent = datetime.now(timezone.utc)
+        for row in rows:
+            row.status = SENT
+            row.sentAt = sent
+            row.error = None
+            metrics.inc("outbox_sent_total")
+            if row.createdAt is not None:
+                # queue time included: from the alert's commit to the send
+                metrics.observe(
+                    "outbox_delivery_seconds",
+                    (sent - to_utc(row.createdAt)).total_seconds(),
+                )
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from python.env import (
+        get_alert_config,
+        get_database_url,
+        get_outbox_config,
+        get_smtp_config,
+    )
+
+    load_dotenv()
+    if sys.argv[1:] not in [[], ["setup"]]:
+        print("Usage: python -m python.outbox [setup]")
+        sys.exit(1)
+    config = get_outbox_config()
+    engine = create_engine(get_database_url(), pool_pre_ping=True)
+    if sys.argv[1:] == ["setup"]:
+        setup(engine)
+        sys.exit(0)
+    Dispatcher(
+        sessionmaker(bind=engine),
+        get_smtp_config(),
+        batch_size=config["batch_size"],
+        max_attempts=config["max_attempts"],
+        backoff=config["backoff"],
+        retention_days=config["retention_days"],
+        digest_window=get_alert_config()["digest_window"],
+    ).run(config["interval"])
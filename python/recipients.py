@@ -0,0 +1,75 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from python.metrics import metrics
+from python.models import Member, User
+
+
+class RecipientCache:
+    """Member email addresses per organization, re-read after `ttl` seconds.
+
+    An alert burst in one organization costs one membership query per TTL
+    instead of one per alert. Member and User changes flushed through a
+    session in this process invalidate the affected entries; changes made by
+    other services are seen when the entry expires or after invalidate().
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._emails = {}  # organization id -> (fetched at, [email])
+
+    def __len__(self):
+        return len(self._emails)
+
+    def get(self, session, organization_id):
+        entry = self._emails.get(organization_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            metrics.inc("monitor_recipient_cache_hits_total")
+            return entry[1]
+        metrics.inc("monitor_recipient_cache_misses_total")
+        emails = query_emails(session, organization_id)
+        if emails is None:
+            return []
+        self._emails[organization_id] = (time.monotonic(), emails)
+        return emails
+
+    def invalidate(self, organization_id=None):
+        """Forget one organization's recipients, or all of them."""
+        if organization_id is None:
+            self._emails.clear()
+        else:
+            self._emails.pop(organization_id, None)
+
+
+def query_emails(session, organization_id):
+    """Member email addresses of an organization, or None on error."""
+    try:
+        # alerts are sent mid-cycle; flushing the cycle's pending changes here
+        # would write them one row at a time
+        with session.no_autoflush:
+            members = (
+                session.query(User.email)
+                .join(Member, Member.userId == User.id)
+                .filter(Member.organizationId == organization_id)
+                .all()
+            )
+        return [member[0] for member in members]
+    except Exception as e:
+        print(f"Error retrieving organization emails: {e}")
+        return None
+
+
+recipients = RecipientCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_members(session, flush_context):
+    for obj in [*session.new, *session.deleted]:
+        if isinstance(obj, Member):
+            recipients.invalidate(obj.organizationId)
+    # an updated member may have moved between organizations, and a user may
+    # belong to several
+    if any(isinstance(obj, (Member, User)) for obj in session.dirty):
+        recipients.invalidate()
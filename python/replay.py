@@ -0,0 +1,307 @@
+"""Replay trigger rules over historical metrics without alerting.
+
+Reports, per rule, how many runs of a project would have been alerted in a
+time window and what the monitor's query for the rule costs in ClickHouse.
+Nothing is written to Postgres: no notifications, no run status changes.
+
+    python -m python.replay --tenant org --project examples \\
+        --start 2026-10-01 --end 2026-10-08 \\
+        --trigger '{"loss": {"operator": ">", "threshold": 10}}'
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from python.server import last_update_query, threshold_query
+from python.tail import COMPARE
+from python.triggers import compile_trigger, window_query
+from python.utils import to_utc
+
+STALENESS = "staleness"
+
+
+class Cost:
+    """ClickHouse work of one or more queries, from the query summaries."""
+
+    def __init__(self):
+        self.queries = 0
+        self.read_rows = 0
+        self.read_bytes = 0
+        self.seconds = 0.0
+
+    def add(self, result, seconds):
+        summary = getattr(result, "summary", None) or {}
+        self.queries += 1
+        self.read_rows += int(summary.get("read_rows", 0))
+        self.read_bytes += int(summary.get("read_bytes", 0))
+        self.seconds += seconds
+
+    def as_dict(self):
+        return {
+            "queries": self.queries,
+            "read_rows": self.read_rows,
+            "read_bytes": self.read_bytes,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def query(ch_client, cost, ch_query, ch_params):
+    start = time.perf_counter()
+    result = ch_client.query(ch_query, parameters=ch_params)
+    cost.add(result, time.perf_counter() - start)
+    return result.result_rows
+
+
+def first_violation(rule, times, values):
+    """Index of the first row at which the monitor would have fired, or None.
+
+    Mirrors the live checks: value rules fire on the first crossing row,
+    "avg" once the mean of the last `steps` values crosses, "nonfinite" on the
+    first NaN/Inf, and plateau rules once `steps` values pass without a new
+    minimum/maximum.
+    """
+    if rule.kind == "value":
+        hits = np.flatnonzero(COMPARE[rule.operator](values, rule.threshold))
+    elif rule.kind == "nonfinite":
+        hits = np.flatnonzero(~np.isfinite(values))
+    elif rule.kind == "avg":
+        if values.size < rule.steps:
+            return None
+        means = sliding_window_view(values, rule.steps).mean(axis=1)
+        hits = np.flatnonzero(COMPARE[rule.operator](means, rule.threshold))
+        hits = hits + rule.steps - 1
+    else:
+        if values.size <= rule.steps:
+            return None
+        best, accumulate = (
+            (np.fmin.reduce, np.fmin.accumulate)
+            if rule.kind == "plateau_min"
+            else (np.fmax.reduce, np.fmax.accumulate)
+        )
+        # row i fires when the best of values[i-steps+1 : i+1] is no better
+        # than the best of everything before it
+        prior = accumulate(values)[: -rule.steps]
+        recent = best(sliding_window_view(values, rule.steps), axis=1)[1:]
+        improved = recent < prior if rule.kind == "plateau_min" else recent > prior
+        hits = np.flatnonzero(~improved) + rule.steps
+    return int(hits[0]) if hits.size else None
+
+
+def first_stall(times, grace):
+    """Index of the first row logged more than `grace` seconds after the
+    previous one, i.e. the end of a gap evaluate_run_time would have flagged."""
+    seconds = np.array([t.timestamp() for t in times])
+    hits = np.flatnonzero(np.diff(seconds) > grace)
+    return int(hits[0]) + 1 if hits.size else None
+
+
+def replay(ch_client, tenant, project, start, end, triggers, grace=120, batch_size=100):
+    """Replay `triggers` (a loggerSettings["trigger"] dict) over a window.
+
+    Runs are evaluated in batches of `batch_size`, one query per batch for the
+    triggers' metrics and one for the staleness check. Returns the report as a
+    dict keyed by rule name, plus STALENESS for the evaluate_run_time logic.
+    """
+    rules = {}
+    for log_name, trigger in triggers.items():
+        rule = compile_trigger(log_name, trigger)
+        if rule is None:
+            raise ValueError(f"Invalid trigger on {log_name}: {trigger}")
+        rules[log_name] = rule
+
+    window = {"tenantId": tenant, "projectName": project, "start": start, "end": end}
+    replay_cost = Cost()
+    run_ids = [
+        row[0]
+        for row in query(
+            ch_client,
+            replay_cost,
+            """
+            SELECT DISTINCT runId
+            FROM mlop_metrics
+            WHERE tenantId = %(tenantId)s
+                AND projectName = %(projectName)s
+                AND time >= %(start)s AND time < %(end)s
+            ORDER BY runId
+            """,
+            window,
+        )
+    ]
+
+    alerts = {name: [] for name in [*rules, STALENESS]}
+    for i in range(0, len(run_ids), batch_size):
+        batch = run_ids[i : i + batch_size]
+        params = {**window, "runIds": tuple(batch), "logNames": tuple(rules)}
+        series = {}
+        if rules:
+            for run_id, log_name, t, value in query(
+                ch_client,
+                replay_cost,
+                """
+                SELECT runId, logName, time, value
+                FROM mlop_metrics
+                WHERE tenantId = %(tenantId)s
+                    AND projectName = %(projectName)s
+                    AND runId IN %(runIds)s
+                    AND logName IN %(logNames)s
+                    AND time >= %(start)s AND time < %(end)s
+                ORDER BY runId, logName, step, time
+                """,
+                params,
+            ):
+                series.setdefault((run_id, log_name), ([], []))
+                series[(run_id, log_name)][0].append(to_utc(t))
+                series[(run_id, log_name)][1].append(value)
+        for (run_id, log_name), (times, values) in series.items():
+            idx = first_violation(rules[log_name], times, np.asarray(values, float))
+            if idx is not None:
+                alerts[log_name].append((run_id, times[idx], values[idx]))
+
+        seen = {}
+        for run_id, t in query(
+            ch_client,
+            replay_cost,
+            """
+            SELECT DISTINCT runId, toStartOfSecond(time) AS second
+            FROM mlop_metrics
+            WHERE tenantId = %(tenantId)s
+                AND projectName = %(projectName)s
+                AND runId IN %(runIds)s
+                AND time >= %(start)s AND time < %(end)s
+            ORDER BY runId, second
+            """,
+            params,
+        ):
+            seen.setdefault(run_id, []).append(to_utc(t))
+        for run_id, times in seen.items():
+            idx = first_stall(times, grace)
+            if idx is not None:
+                # flagged `grace` seconds after the last update before the gap
+                last_update_time = times[idx - 1]
+                alerts[STALENESS].append(
+                    (
+                        run_id,
+                        last_update_time + timedelta(seconds=grace),
+                        last_update_time,
+                    )
+                )
+
+    report = {
+        name: {
+            "runs": len(run_ids),
+            "alerts": len(fired),
+            "rate": round(len(fired) / len(run_ids), 4) if run_ids else 0.0,
+            "first": [
+                {"runId": run_id, "time": str(t), "value": _json_value(value)}
+                for run_id, t, value in sorted(fired, key=lambda a: a[1])[:10]
+            ],
+            "cycle_cost": cycle_cost(
+                ch_client, tenant, project, run_ids, name, rules
+            ).as_dict(),
+        }
+        for name, fired in alerts.items()
+    }
+    report["replay_cost"] = replay_cost.as_dict()
+    return report
+
+
+def cycle_cost(ch_client, tenant, project, run_ids, name, rules):
+    """Cost of the query one monitor cycle issues for rule `name` over all
+    replayed runs, as it stands with today's data."""
+    cost = Cost()
+    if not run_ids:
+        return cost
+    runs = [
+        SimpleNamespace(
+            id=run_id, organizationId=tenant, project=SimpleNamespace(name=project)
+        )
+        for run_id in run_ids
+    ]
+    if name == STALENESS:
+        ch_query, ch_params = last_update_query(runs)
+    elif rules[name].kind == "value":
+        rule = rules[name]
+        ch_query, ch_params = threshold_query(
+            [(run, rule.log_name, rule.operator, rule.threshold) for run in runs]
+        )
+    else:
+        ch_query, ch_params = window_query([(run, rules[name]) for run in runs])
+    query(ch_client, cost, ch_query, ch_params)
+    return cost
+
+
+def _json_value(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return str(value)
+    value = float(value)
+    return value if np.isfinite(value) else str(value)
+
+
+def print_report(report):
+    print(
+        f"{'rule':<20} {'runs':>6} {'alerts':>7} {'rate':>7} "
+        f"{'cycle_rows':>12} {'cycle_bytes':>12} {'cycle_s':>8}"
+    )
+    for name, entry in report.items():
+        if name == "replay_cost":
+            continue
+        cost = entry["cycle_cost"]
+        print(
+            f"{name:<20} {entry['runs']:>6} {entry['alerts']:>7} "
+            f"{entry['rate']:>7.2%} {cost['read_rows']:>12} "
+            f"{cost['read_bytes']:>12} {cost['seconds']:>8.3f}"
+        )
+        for alert in entry["first"]:
+            print(f"    run {alert['runId']} at {alert['time']}: {alert['value']}")
+    cost = report["replay_cost"]
+    print(
+        f"replay: {cost['queries']} queries, {cost['read_rows']} rows, "
+        f"{cost['read_bytes']} bytes, {cost['seconds']:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    from clickhouse_connect import get_client
+    from dotenv import load_dotenv
+
+    from python.env import get_clickhouse_config
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenant", required=True, help="organization id")
+    parser.add_argument("--project", required=True)
+    parser.add_argument("--start", required=True, help="ISO time, UTC if naive")
+    parser.add_argument("--end", default=None, help="ISO time, default now")
+    parser.add_argument("--trigger", default="{}", help="loggerSettings trigger JSON")
+    parser.add_argument("--grace", type=int, default=120)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    load_dotenv()
+    try:
+        report = replay(
+            get_client(**get_clickhouse_config()),
+            args.tenant,
+            args.project,
+            to_utc(args.start),
+            to_utc(args.end) if args.end else datetime.now(timezone.utc),
+            json.loads(args.trigger),
+            grace=args.grace,
+            batch_size=args.batch_size,
+        )
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,128 @@
+import heapq
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import chain, zip_longest
+
+from python.utils import to_utc
+
+
+class RunScheduler:
+    """Priority queue of RUNNING runs keyed by their next possible deadline.
+
+    A run whose last metric arrived at `t` cannot go stale before `t + grace`,
+    so it is not checked again until then. Runs with triggers are checked at
+    least every `interval` seconds, since a threshold violation can show up in
+    any new metric row.
+    """
+
+    def __init__(self, grace=120, interval=10):
+        self.grace = timedelta(seconds=grace)
+        self.interval = timedelta(seconds=interval)
+        self._heap = []  # (due, run id, version)
+        self._due = {}  # run id -> (due, version) of the live heap entry
+        self._updated = {}  # run id -> run.updatedAt when it was scheduled
+
+    def __len__(self):
+        return len(self._due)
+
+    def due(self, runs, now=None):
+        """Sync the queue with the current RUNNING set and return the due runs.
+
+        New runs and runs whose row changed since they were scheduled are due
+        immediately; runs that left the RUNNING set are dropped.
+        """
+        now = now or datetime.now(timezone.utc)
+        by_id = {run.id: run for run in runs}
+
+        for run_id in list(self._updated):
+            if run_id not in by_id:
+                self._forget(run_id)
+        for run in runs:
+            if run.id not in self._due or self._updated[run.id] != run.updatedAt:
+                self._push(run, now)
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, run_id, version = heapq.heappop(self._heap)
+            if self._due.get(run_id, (None, None))[1] != version:
+                continue  # superseded by a later push
+            del self._due[run_id]
+            due.append(by_id[run_id])
+        return due
+
+    def reschedule(self, runs, last_seen, now=None):
+        """Queue checked runs again at their next possible deadline."""
+        now = now or datetime.now(timezone.utc)
+        epoch = datetime.fromtimestamp(0, timezone.utc)
+        for run in runs:
+            deadline = now + self.interval
+            try:
+                seen = to_utc(last_seen[run.id]) if last_seen else None
+            except (KeyError, ValueError):
+                seen = None
+            if seen is not None:
+                if seen == epoch:
+                    seen = to_utc(run.updatedAt)
+                if seen + self.grace > now:
+                    deadline = max(deadline, seen + self.grace)
+            if _has_triggers(run):
+                deadline = min(deadline, now + self.interval)
+            self._push(run, deadline)
+
+    def _push(self, run, due):
+        version = self._due.get(run.id, (None, 0))[1] + 1
+        self._due[run.id] = (due, version)
+        self._updated[run.id] = run.updatedAt
+        heapq.heappush(self._heap, (due, run.id, version))
+
+    def _forget(self, run_id):
+        self._due.pop(run_id, None)
+        del self._updated[run_id]
+
+
+class FairQueue:
+    """Round-robin run order across organizations with a per-cycle time budget.
+
+    batches() interleaves runs by organizationId so one tenant with thousands
+    of runs cannot delay every other tenant's checks, and yields them in
+    batches of `batch_size` until `budget` seconds have passed. Runs that were
+    not reached are carried over and go first in the next cycle.
+    """
+
+    def __init__(self, budget=0, batch_size=500):
+        self.budget = budget
+        self.batch_size = batch_size
+        self.carried = []  # run ids not reached in the previous cycle
+
+    def batches(self, runs):
+        start = time.monotonic()
+        position = {run_id: i for i, run_id in enumerate(self.carried)}
+        ordered = sorted(
+            [run for run in runs if run.id in position], key=lambda r: position[r.id]
+        ) + round_robin([run for run in runs if run.id not in position])
+
+        for i in range(0, len(ordered), self.batch_size):
+            if i and self.budget and time.monotonic() - start >= self.budget:
+                self.carried = [run.id for run in ordered[i:]]
+                print(
+                    f"Cycle budget of {self.budget}s exceeded, "
+                    f"carrying over {len(self.carried)} runs"
+                )
+                return
+            yield ordered[i : i + self.batch_size]
+        self.carried = []
+
+
+def round_robin(runs):
+    by_organization = {}
+    for run in runs:
+        by_organization.setdefault(run.organizationId, []).append(run)
+    return [
+        run
+        for run in chain.from_iterable(zip_longest(*by_organization.values()))
+        if run is not None
+    ]
+
+
+def _has_triggers(run):
+    return bool((run.loggerSettings or {}).get("trigger"))
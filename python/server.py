@@ -2,115 +2,450 @@ import hashlib
 from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
-
-from python.emails import send_email
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from python.clickhouse import RUN_LAST_SEEN, RUN_METRIC_SUMMARY
+from python.coalesce import dedup
+from python.liveness import get_heartbeats
+from python.metrics import metrics
 from python.models import (
     ApiKey,
-    Member,
     Notification,
     Organization,
     Run,
     RunStatus,
-    User,
 )
-from python.templates import process_run_email
-from python.utils import get_run_url
+from python.notifications import alerts
+from python.outbox import queue_email
+from python.recipients import recipients
+from python.supervisor import isolate
+from python.templates import process_run_email, process_run_email_text
+from python.triggers import TriggerCache, describe, window_query
+from python.utils import get_run_url, to_utc
+
+
+def process_runs(
+    session,
+    ch_client,
+    smtp_config,
+    grace=120,
+    scheduler=None,
+    shards=None,
+    triggers=None,
+    tail=None,
+    heartbeats=False,
+    fairness=None,
+    tracker=None,
+    aggregates=None,
+):
+    if triggers is None:
+        triggers = TriggerCache()
+    if tail is not None:
+        # tail state advanced by a cycle that did not commit
+        tail.discard()
+    checked = get_running_runs(session, scheduler, shards, triggers, tracker)
+    if aggregates is not None:
+        aggregates.refresh(ch_client)
+
+    batches = fairness.batches(checked) if fairness is not None else [checked]
+    # status changes of earlier batches are written by write_statuses; reads
+    # in later batches must not autoflush them as one UPDATE per run
+    with session.no_autoflush:
+        for batch in batches:
+            check_runs(
+                session,
+                ch_client,
+                smtp_config,
+                batch,
+                grace,
+                scheduler,
+                triggers,
+                tail,
+                heartbeats,
+                aggregates,
+            )
 
+    with metrics.time("monitor_phase_seconds", phase="postgres_write"):
+        try:
+            write_statuses(session)
+            alerts.flush(session, commit=False)
+            session.commit()
+        except Exception:
+            alerts.restore()
+            raise
+        alerts.confirm()
+    if tail is not None:
+        tail.commit()
+    print("All updates saved to the database.")
+
+
+def check_runs(
+    session,
+    ch_client,
+    smtp_config,
+    runs,
+    grace,
+    scheduler=None,
+    triggers=None,
+    tail=None,
+    heartbeats=False,
+    aggregates=None,
+):
+    if triggers is None:
+        triggers = TriggerCache()
+    metrics.inc("monitor_runs_checked_total", len(runs))
 
-def process_runs(session, ch_client, smtp_config, grace=120):
-    runs = session.query(Run).filter(Run.status == "RUNNING").all()
+    if heartbeats:
+        last_seen = get_last_seen(session, ch_client, runs, grace, aggregates)
+    else:
+        last_seen = get_last_update_times(ch_client, runs, aggregates)
+    if last_seen is not None:
+        check_run_times(
+            session,
+            ch_client,
+            smtp_config,
+            [run for run in runs if run.id in last_seen],
+            grace,
+            last_seen,
+        )
+    if tail is not None:
+        tail.check(session, ch_client, smtp_config, runs, triggers)
+    else:
+        check_thresholds(
+            session,
+            ch_client,
+            smtp_config,
+            triggers.rules(runs),
+            aggregates=aggregates,
+        )
+        check_window_triggers(
+            session, ch_client, smtp_config, triggers.window_rules(runs)
+        )
+    if scheduler is not None:
+        scheduler.reschedule(runs, last_seen)
+
+
+def write_statuses(session):
+    """Write pending Run.status changes as one UPDATE ... WHERE id IN per status.
+
+    The checks set run.status on the loaded objects; without this the flush
+    would issue one UPDATE per run.
+    """
+    transitions = {}
+    for obj in session.dirty:
+        if isinstance(obj, Run) and inspect(obj).attrs.status.history.has_changes():
+            transitions.setdefault(RunStatus(obj.status), []).append(obj)
+
+    for status, runs in transitions.items():
+        for run in runs:
+            set_committed_value(run, "status", status)
+        session.query(Run).filter(Run.id.in_([run.id for run in runs])).update(
+            {Run.status: status}, synchronize_session=False
+        )
+    return transitions
+
+
+def get_running_runs(session, scheduler=None, shards=None, triggers=None, tracker=None):
+    with metrics.time("monitor_phase_seconds", phase="postgres_fetch"):
+        if tracker is not None:
+            runs = tracker.sync(session, shards)
+        else:
+            query = (
+                session.query(Run)
+                .options(joinedload(Run.project), joinedload(Run.organization))
+                .filter(Run.status == "RUNNING")
+            )
+            if shards is not None:
+                query = query.filter(shards.clause(Run.id))
+            runs = query.all()
+    metrics.set("monitor_runs_running", len(runs))
     print(f"Processing {len(runs)} runs")
+    checked = []
     for run in runs:
         if not run.project:
             print(f"Run {run.id} has no associated project.")
             continue
-        check_run_time(session, ch_client, smtp_config, run, grace)
-        if run.loggerSettings.get("trigger"):  # TODO: clean before parsing
-            for k, v in run.loggerSettings["trigger"].items():
-                if v.get("operator") and isinstance(k, str):
-                    check_threshold(
-                        session,
-                        ch_client,
-                        smtp_config,
-                        run,
-                        log_name=k,
-                        threshold=v.get("threshold"),
-                        operator=v.get("operator"),
-                    )
-
-    session.commit()
-    print("All updates saved to the database.")
+        checked.append(run)
+
+    if triggers is not None:
+        triggers.retain(checked)
+    if scheduler is not None:
+        checked = scheduler.due(checked)
+        print(f"Checking {len(checked)} due runs")
+    metrics.set("monitor_runs_due", len(checked))
+    return checked
+
+
+def query_clickhouse(ch_client, ch_query, ch_params):
+    metrics.inc("monitor_clickhouse_queries_total")
+    try:
+        with metrics.time("monitor_phase_seconds", phase="clickhouse"):
+            return ch_client.query(ch_query, parameters=ch_params)
+    except Exception:
+        metrics.inc("monitor_clickhouse_errors_total")
+        raise
 
 
 def get_emails(session, organization_id):
+    return recipients.get(session, organization_id)
+
+
+def check_thresholds(session, ch_client, smtp_config, rules, aggregates=None):
+    """Threshold checks for (run, log_name, operator, threshold) tuples.
+
+    Every rule is sent to ClickHouse as one array parameter and joined
+    against mlop_metrics, so the query count does not grow with the number of
+    runs or triggers. Rules come validated from a TriggerCache. Returns the
+    list of violations as
+    (run, log_name, operator, threshold, last_update_time, violation_value).
+    """
+    if not rules:
+        return []
+
     try:
-        members = (
-            session.query(User.email)
-            .join(Member, Member.userId == User.id)
-            .filter(Member.organizationId == organization_id)
-            .all()
-        )
-        emails = [member[0] for member in members]
-        return emails
+        rows = get_threshold_rows(ch_client, rules, aggregates)
     except Exception as e:
-        print(f"Error retrieving organization emails: {e}")
-        return []
+        print(f"Error querying ClickHouse for {len(rules)} threshold checks: {e}")
+        return None
 
+    return apply_threshold_rows(session, smtp_config, rules, rows)
 
-def check_threshold(
-    session, ch_client, smtp_config, run, log_name, threshold, operator=">="
-):
-    if not (operator in ["<", "<=", ">", ">="] and isinstance(threshold, (int, float))):
-        print(f"Invalid operator: {operator}")
-        return False
-    project_name = run.project.name
 
-    ch_query = f"""
-        SELECT time AS last_update_time, value
-        FROM mlop_metrics
-        WHERE projectName = %(projectName)s
-            AND runId = %(runId)s
-            AND tenantId = %(tenantId)s
-            AND logName = %(logName)s
-            AND value {operator} %(threshold)s
-        ORDER BY time DESC
-        LIMIT 1
+def get_threshold_rows(ch_client, rules, aggregates=None):
+    """(idx, last_update_time, violation_value) for every violated rule.
+
+    With the run_metric_summary aggregate available, rules are confirmed from
+    its min/max per (run, logName), and mlop_metrics is read only for the
+    confirmed rules whose last value is not itself the latest violation.
     """
+    if aggregates is None or RUN_METRIC_SUMMARY not in aggregates:
+        return query_clickhouse(ch_client, *threshold_query(rules)).result_rows
+
+    result = query_clickhouse(ch_client, *summary_threshold_query(rules))
+    rows, pending = split_summary_rows(result.result_rows)
+    if pending:
+        ch_query, ch_params = threshold_query([rules[idx] for idx in pending])
+        raw_rows = query_clickhouse(ch_client, ch_query, ch_params).result_rows
+        rows.extend(remap_rows(pending, raw_rows))
+    return rows
 
+
+def threshold_query(rules):
+    ch_query = """
+        SELECT r.idx, MAX(m.time) AS last_update_time, argMax(m.value, m.time) AS value
+        FROM mlop_metrics AS m
+        INNER JOIN (
+            SELECT
+                rule.1 AS idx,
+                rule.2 AS tenantId,
+                rule.3 AS projectName,
+                rule.4 AS runId,
+                rule.5 AS logName,
+                rule.6 AS operator,
+                rule.7 AS threshold
+            FROM (SELECT arrayJoin(%(rules)s) AS rule)
+        ) AS r
+            ON m.tenantId = r.tenantId
+            AND m.projectName = r.projectName
+            AND m.runId = r.runId
+            AND m.logName = r.logName
+        WHERE (m.tenantId, m.projectName, m.runId, m.logName) IN %(keys)s
+            AND multiIf(
+                r.operator = '<', m.value < r.threshold,
+                r.operator = '<=', m.value <= r.threshold,
+                r.operator = '>', m.value > r.threshold,
+                m.value >= r.threshold
+            )
+        GROUP BY r.idx
+    """
     ch_params = {
-        "projectName": project_name,
-        "runId": run.id,
-        "tenantId": run.organizationId,
-        "logName": log_name,
-        "threshold": threshold,
+        "rules": [
+            (
+                idx,
+                run.organizationId,
+                run.project.name,
+                run.id,
+                log_name,
+                operator,
+                float(threshold),
+            )
+            for idx, (run, log_name, operator, threshold) in enumerate(rules)
+        ],
+        "keys": tuple(
+            (run.organizationId, run.project.name, run.id, log_name)
+            for run, log_name, _, _ in rules
+        ),
     }
+    return ch_query, ch_params
+
+
+def summary_threshold_query(rules):
+    """Rules violated by any value, with each key's last time and value.
+
+    Takes the same parameters as threshold_query; a rule is violated when the
+    key's minimum (for < and <=) or maximum (for > and >=) crosses it.
+    """
+    ch_query = f"""
+        SELECT
+            r.idx,
+            s.last_time,
+            s.last_value,
+            multiIf(
+                r.operator = '<', s.last_value < r.threshold,
+                r.operator = '<=', s.last_value <= r.threshold,
+                r.operator = '>', s.last_value > r.threshold,
+                s.last_value >= r.threshold
+            ) AS last_violates
+        FROM (
+            SELECT
+                tenantId,
+                projectName,
+                runId,
+                logName,
+                minMerge(minValue) AS min_value,
+                maxMerge(maxValue) AS max_value,
+                argMaxMerge(lastValue) AS last_value,
+                maxMerge(lastTime) AS last_time
+            FROM {RUN_METRIC_SUMMARY}
+            WHERE (tenantId, projectName, runId, logName) IN %(keys)s
+            GROUP BY tenantId, projectName, runId, logName
+        ) AS s
+        INNER JOIN (
+            SELECT
+                rule.1 AS idx,
+                rule.2 AS tenantId,
+                rule.3 AS projectName,
+                rule.4 AS runId,
+                rule.5 AS logName,
+                rule.6 AS operator,
+                rule.7 AS threshold
+            FROM (SELECT arrayJoin(%(rules)s) AS rule)
+        ) AS r
+            ON s.tenantId = r.tenantId
+            AND s.projectName = r.projectName
+            AND s.runId = r.runId
+            AND s.logName = r.logName
+        WHERE multiIf(
+            r.operator = '<', s.min_value < r.threshold,
+            r.operator = '<=', s.min_value <= r.threshold,
+            r.operator = '>', s.max_value > r.threshold,
+            s.max_value >= r.threshold
+        )
+    """
+    return ch_query, threshold_query(rules)[1]
+
+
+def split_summary_rows(rows):
+    """Split summary_threshold_query rows into threshold rows and the indexes
+    of rules whose latest violating row still has to be found."""
+    threshold_rows, pending = [], []
+    for idx, last_time, last_value, last_violates in rows:
+        if last_violates:
+            threshold_rows.append((idx, last_time, last_value))
+        else:
+            pending.append(idx)
+    return threshold_rows, sorted(pending)
+
+
+def remap_rows(pending, rows):
+    """Map threshold rows of a query over `pending` rules back to their idx."""
+    return [(pending[idx], *row) for idx, *row in rows]
+
+
+def apply_threshold_rows(session, smtp_config, rules, rows):
+    violations = []
+    for idx, last_update_time, violation_value in sorted(rows, key=lambda r: r[0]):
+        if last_update_time is None:
+            continue
+        run, log_name, operator, threshold = rules[idx]
+        if isolate(
+            run,
+            evaluate_threshold,
+            session,
+            smtp_config,
+            run,
+            log_name,
+            threshold,
+            operator,
+            last_update_time,
+            violation_value,
+        ):
+            violations.append(
+                (run, log_name, operator, threshold, last_update_time, violation_value)
+            )
+    return violations
+
 
+def check_window_triggers(session, ch_client, smtp_config, rules):
+    """Evaluate windowed and aggregate trigger rules in one ClickHouse query.
+
+    `rules` are (run, TriggerRule) pairs; see python/triggers.py for the
+    supported operators. Returns the violations as
+    (run, rule, last_update_time, violation_value).
+    """
+    if not rules:
+        return []
+
+    ch_query, ch_params = window_query(rules)
     try:
-        result = ch_client.query(ch_query, parameters=ch_params)
+        result = query_clickhouse(ch_client, ch_query, ch_params)
     except Exception as e:
-        print(f"Error querying ClickHouse for run {run.id} threshold check: {e}")
+        print(f"Error querying ClickHouse for {len(rules)} window checks: {e}")
         return None
 
-    if not result.result_rows or result.result_rows[0][0] is None:
-        print(f"No threshold violation found for run {run.id} on {log_name}.")
-        return None
+    return apply_window_rows(session, smtp_config, rules, result.result_rows)
 
-    last_update_time = result.result_rows[0][0]
-    violation_value = result.result_rows[0][1]
 
-    if isinstance(last_update_time, str):
-        try:
-            last_update_time = datetime.fromisoformat(last_update_time)
-        except ValueError as e:
-            print(f"Error parsing metric time for run {run.id}: {e}")
-            return None
+def apply_window_rows(session, smtp_config, rules, rows):
+    violations = []
+    for idx, last_update_time, violation_value in sorted(rows, key=lambda r: r[0]):
+        run, rule = rules[idx]
+        if isolate(
+            run,
+            evaluate_threshold,
+            session,
+            smtp_config,
+            run,
+            rule.log_name,
+            rule.threshold,
+            rule.operator,
+            last_update_time,
+            violation_value,
+            reason=describe(rule, violation_value),
+        ):
+            violations.append((run, rule, last_update_time, violation_value))
+    return violations
+
+
+def evaluate_threshold(
+    session,
+    smtp_config,
+    run,
+    log_name,
+    threshold,
+    operator,
+    last_update_time,
+    violation_value,
+    reason=None,
+):
+    project_name = run.project.name
+    reason = reason or (
+        f"Threshold exceeded for {log_name}: {violation_value} {operator} {threshold}"
+    )
 
-    if last_update_time.tzinfo is None:
-        last_update_time = last_update_time.replace(tzinfo=timezone.utc)
+    try:
+        last_update_time = to_utc(last_update_time)
+    except ValueError as e:
+        print(f"Error parsing metric time for run {run.id}: {e}")
+        return None
 
-    print(
-        f"Run {run.id} (Project: {project_name}) {log_name} value {violation_value} {operator} {threshold} at {last_update_time}."
+    print(f"Run {run.id} (Project: {project_name}) {reason} at {last_update_time}.")
+    metrics.observe(
+        "monitor_detection_lag_seconds",
+        (datetime.now(timezone.utc) - last_update_time).total_seconds(),
+        check="threshold",
     )
 
     run.status = RunStatus.CANCELLED  # run.status = "FAILED"
@@ -120,7 +455,7 @@ def check_threshold(
         smtp_config,
         last_update_time,
         f"Threshold Exceeded on {log_name}",
-        f"Threshold exceeded for {log_name}: {violation_value} {operator} {threshold}",
+        reason,
         "RUN_FAILED",
         email=True,
     )
@@ -128,41 +463,141 @@ def check_threshold(
     return True
 
 
-def check_run_time(session, ch_client, smtp_config, run, grace):
-    now_utc = datetime.now(timezone.utc)
-    project_name = run.project.name
+def get_last_update_times(ch_client, runs, aggregates=None):
+    """Fetch MAX(time) for every run in `runs` with one grouped query.
 
-    ch_query = """
-        SELECT MAX(time) AS last_update_time
-        FROM mlop_metrics
-        WHERE projectName = %(projectName)s
-            AND runId = %(runId)s
-            AND tenantId = %(tenantId)s
+    Reads the run_last_seen aggregate instead of mlop_metrics when it is in
+    `aggregates`. Returns a dict of run id to last metric time, or None if the
+    query failed.
     """
-    ch_params = {
-        "projectName": project_name,
-        "runId": run.id,
-        "tenantId": run.organizationId,
-    }
+    if not runs:
+        return {}
+
+    ch_query, ch_params = last_update_query(runs, aggregates)
     try:
-        result = ch_client.query(ch_query, parameters=ch_params)
+        result = query_clickhouse(ch_client, ch_query, ch_params)
     except Exception as e:
-        print(f"Error querying ClickHouse for run {run.id}: {e}")
+        print(f"Error querying ClickHouse for {len(runs)} runs: {e}")
         return None
 
-    if not result.result_rows or result.result_rows[0][0] is None:
-        print(f"No metric data for run {run.id}.")
-        return None
+    return last_update_rows(runs, result.result_rows)
 
-    last_update_time = result.result_rows[0][0]
-    if isinstance(last_update_time, str):
-        try:
-            last_update_time = datetime.fromisoformat(last_update_time)
-        except ValueError as e:
-            print(f"Error parsing update time for run {run.id}: {e}")
-            return None
-    if last_update_time.tzinfo is None:
-        last_update_time = last_update_time.replace(tzinfo=timezone.utc)
+
+def last_update_query(runs, aggregates=None):
+    if aggregates is not None and RUN_LAST_SEEN in aggregates:
+        # point reads on the aggregate's sorting key
+        ch_query = f"""
+            SELECT tenantId, projectName, runId, maxMerge(lastSeen) AS last_update_time
+            FROM {RUN_LAST_SEEN}
+            WHERE (tenantId, projectName, runId) IN %(keys)s
+            GROUP BY tenantId, projectName, runId
+        """
+    else:
+        ch_query = """
+            SELECT tenantId, projectName, runId, MAX(time) AS last_update_time
+            FROM mlop_metrics
+            WHERE (tenantId, projectName, runId) IN %(keys)s
+            GROUP BY tenantId, projectName, runId
+        """
+    ch_params = {
+        "keys": tuple((run.organizationId, run.project.name, run.id) for run in runs)
+    }
+    return ch_query, ch_params
+
+
+def last_update_rows(runs, rows):
+    # Runs without any metric rows are absent from the grouped result; they map
+    # to the epoch, which is what the ungrouped MAX(time) yields for an empty set.
+    last_seen = {
+        (tenant_id, project_name, run_id): last_update_time
+        for tenant_id, project_name, run_id, last_update_time in rows
+    }
+    epoch = datetime.fromtimestamp(0, timezone.utc)
+    return {
+        run.id: last_seen.get((run.organizationId, run.project.name, run.id), epoch)
+        for run in runs
+    }
+
+
+def get_last_seen(session, ch_client, runs, grace, aggregates=None):
+    """Last sign of life per run, from heartbeats first and ClickHouse second.
+
+    Runs with a heartbeat within `grace` are live without touching ClickHouse;
+    only the rest are looked up with get_last_update_times. If that query
+    fails, only the runs with a recent heartbeat are returned.
+    """
+    last_seen, beats = get_recent_heartbeats(session, runs, grace)
+    fallback = [run for run in runs if run.id not in last_seen]
+    metric_times = get_last_update_times(ch_client, fallback, aggregates)
+    if metric_times is not None:
+        merge_heartbeats(last_seen, metric_times, beats)
+    return last_seen
+
+
+def get_recent_heartbeats(session, runs, grace):
+    """Returns (heartbeats within `grace`, all heartbeats) keyed by run id."""
+    now_utc = datetime.now(timezone.utc)
+    beats = {
+        run_id: to_utc(last_seen)
+        for run_id, last_seen in get_heartbeats(session, runs).items()
+    }
+    recent = {
+        run_id: beat
+        for run_id, beat in beats.items()
+        if now_utc - beat <= timedelta(seconds=grace)
+    }
+    return recent, beats
+
+
+def merge_heartbeats(last_seen, metric_times, beats):
+    for run_id, last_update_time in metric_times.items():
+        if run_id in beats:
+            try:
+                last_update_time = max(to_utc(last_update_time), beats[run_id])
+            except ValueError:
+                last_update_time = beats[run_id]
+        last_seen[run_id] = last_update_time
+    return last_seen
+
+
+def check_run_times(
+    session, ch_client, smtp_config, runs, grace, last_seen=None, aggregates=None
+):
+    """Staleness check for every run in `runs`.
+
+    Returns a dict of run id to the value of evaluate_run_time.
+    `last_seen` can be passed when the caller already fetched it through
+    get_last_update_times.
+    """
+    if last_seen is None:
+        last_seen = get_last_update_times(ch_client, runs, aggregates)
+    if last_seen is None:
+        return {run.id: None for run in runs}
+
+    now_utc = datetime.now(timezone.utc)
+    return {
+        run.id: isolate(
+            run,
+            evaluate_run_time,
+            session,
+            smtp_config,
+            run,
+            last_seen[run.id],
+            grace,
+            now_utc,
+        )
+        for run in runs
+    }
+
+
+def evaluate_run_time(session, smtp_config, run, last_update_time, grace, now_utc):
+    project_name = run.project.name
+
+    try:
+        last_update_time = to_utc(last_update_time)
+    except ValueError as e:
+        print(f"Error parsing update time for run {run.id}: {e}")
+        return None
 
     # for runs with no metrics, use updatedAt time
     if last_update_time == datetime.fromtimestamp(0, timezone.utc) and timedelta(
@@ -172,6 +607,11 @@ def check_run_time(session, ch_client, smtp_config, run, grace):
 
     time_diff = now_utc - last_update_time
     if timedelta(seconds=grace) < time_diff < timedelta(days=16384):
+        metrics.observe(
+            "monitor_detection_lag_seconds",
+            (time_diff - timedelta(seconds=grace)).total_seconds(),
+            check="staleness",
+        )
         print(
             f"Run {run.id} (Project: {project_name}) last update at {last_update_time} is older than {grace} seconds."
         )
@@ -196,38 +636,53 @@ def check_run_time(session, ch_client, smtp_config, run, grace):
 def send_alert(
     session, run, smtp_config, last_update_time, title, body, level="INFO", email=True
 ):
-    session.add(
-        Notification(
+    key = dedup.admit(run.organizationId, run.id, level, title)
+    if key is None:
+        print(f"Suppressed repeated {level} alert for run {run.id}: {title}")
+        return False
+    metrics.inc("monitor_alerts_total", level=level)
+    with metrics.time("monitor_phase_seconds", phase="alerts"):
+        alerts.add(
+            Notification,
+            key,
             runId=run.id,
             organizationId=run.organizationId,
             type=level,
             content=f"{title}: {body}",
         )
-    )
-    if email:
-        for e in get_emails(session, run.organizationId):
-            send_email(
-                smtp_config,
-                from_address=smtp_config["from_address"],
-                to_address=e,
-                subject=f"mlop: {title} for Run {run.name}",
-                body=process_run_email(
-                    run_name=run.name,
-                    project_name=run.project.name,
-                    last_update_time=last_update_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    time_diff_seconds=int(
-                        (datetime.now(timezone.utc) - last_update_time).total_seconds()
-                    ),
-                    run_url=get_run_url(
-                        host=smtp_config["app_host"],
-                        organization=run.organization.slug,
-                        project=run.project.name,
-                        run_id=run.id,
-                    ),
-                    reason=body,
-                ),
-                html=True,
+        if email:
+            run_url = get_run_url(
+                host=smtp_config["app_host"],
+                organization=run.organization.slug,
+                project=run.project.name,
+                run_id=run.id,
             )
+            # nothing in the email depends on the recipient: render it once
+            fields = {
+                "run_name": run.name,
+                "project_name": run.project.name,
+                "last_update_time": last_update_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "time_diff_seconds": int(
+                    (datetime.now(timezone.utc) - last_update_time).total_seconds()
+                ),
+                "run_url": run_url,
+                "reason": body,
+            }
+            html = process_run_email(**fields)
+            text = process_run_email_text(**fields)
+            subject = f"mlop: {title} for Run {run.name}"
+            summary = f"{title} for Run {run.name} ({run.project.name}): {body}"
+            for e in get_emails(session, run.organizationId):
+                queue_email(
+                    to_address=e,
+                    subject=subject,
+                    body=html,
+                    html=True,
+                    text=text,
+                    summary=summary,
+                    url=run_url,
+                )
+    return True
 
 
 def check_api_key(session: Session, raw_api_key: str):
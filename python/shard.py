@@ -0,0 +1,99 @@
+import math
+
+from sqlalchemy import text
+
+SHARD_LOCK = 0x6D6C6F70  # advisory lock class for shard ownership ("mlop")
+WORKER_LOCK = SHARD_LOCK + 1  # shared advisory lock held by every live worker
+
+
+class ShardLease:
+    """Ownership of a slice of the RUNNING set through Postgres advisory locks.
+
+    Runs are split into `shards` buckets by `Run.id % shards`. Each worker
+    holds a shared presence lock plus one exclusive advisory lock per bucket it
+    owns, all on a dedicated connection so the locks outlive session commits.
+    When a worker dies its connection closes, its locks are released, and the
+    remaining workers pick the buckets up on their next rebalance.
+    """
+
+    def __init__(self, engine, shards=16):
+        self.engine = engine
+        self.shards = shards
+        self.owned = []
+        self._conn = None
+
+    def rebalance(self):
+        """Acquire or release buckets so each live worker owns a fair share."""
+        conn = self._connect()
+        workers = conn.execute(
+            text(
+                "SELECT count(DISTINCT pid) FROM pg_locks "
+                "WHERE locktype = 'advisory' AND classid = :lock AND granted"
+            ),
+            {"lock": WORKER_LOCK},
+        ).scalar()
+        target = math.ceil(self.shards / max(workers, 1))
+
+        owned = self._held(conn)
+        for shard in owned[target:]:
+            conn.execute(
+                text("SELECT pg_advisory_unlock(:lock, :shard)"),
+                {"lock": SHARD_LOCK, "shard": shard},
+            )
+        for shard in range(self.shards):
+            if len(owned) >= target:
+                break
+            if shard in owned:
+                continue
+            if conn.execute(
+                text("SELECT pg_try_advisory_lock(:lock, :shard)"),
+                {"lock": SHARD_LOCK, "shard": shard},
+            ).scalar():
+                owned.append(shard)
+
+        self.owned = self._held(conn)
+        print(f"Worker owns {len(self.owned)}/{self.shards} shards ({workers} workers)")
+        return self.owned
+
+    def clause(self, column):
+        return (column % self.shards).in_(self.owned)
+
+    def release(self):
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT pg_advisory_unlock_all()"))
+                self._conn.close()
+            except Exception as e:
+                print(f"Error releasing shard locks: {e}")
+        self._conn = None
+        self.owned = []
+
+    def _connect(self):
+        if self._conn is not None and not self._conn.closed:
+            try:
+                self._conn.execute(text("SELECT 1"))
+                return self._conn
+            except Exception as e:
+                print(f"Shard lock connection lost: {e}")
+                self.release()
+
+        self._conn = self.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        )
+        self._conn.execute(
+            text("SELECT pg_advisory_lock_shared(:lock, 0)"), {"lock": WORKER_LOCK}
+        )
+        return self._conn
+
+    def _held(self, conn):
+        return sorted(
+            row[0]
+            for row in conn.execute(
+                text(
+                    "SELECT objid FROM pg_locks "
+                    "WHERE locktype = 'advisory' AND classid = :lock "
+                    "AND pid = pg_backend_pid() AND granted"
+                ),
+                {"lock": SHARD_LOCK},
+            )
+        )
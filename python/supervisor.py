@@ -0,0 +1,138 @@
+from clickhouse_connect.driver.exceptions import Error as ClickHouseError
+from sqlalchemy.exc import SQLAlchemyError
+
+from python.metrics import metrics
+
+
+def isolate(run, check, *args, **kwargs):
+    """Call check(*args, **kwargs) for one run, logging and counting errors.
+
+    Database errors are re-raised, since they leave the session unusable for
+    the remaining runs; the Supervisor recovers from those.
+    """
+    try:
+        return check(*args, **kwargs)
+    except SQLAlchemyError:
+        raise
+    except Exception as e:
+        metrics.inc("monitor_run_errors_total")
+        print(f"Error checking run {run.id}: {e}")
+        return None
+
+
+class Supervisor:
+    """Runs monitor cycles in-process and recovers from the ones that fail.
+
+    A failed cycle rolls the session back; the pool replaces broken Postgres
+    connections on checkout, so the engine is kept. The ClickHouse client is
+    replaced only when ClickHouse failed: when it raised, or when every query
+    of an otherwise completed cycle failed. Caches, schedulers and pools live
+    on, and consecutive failures back off exponentially from `base` to `cap`
+    seconds instead of restarting the interpreter.
+    """
+
+    def __init__(self, session, connect_clickhouse, base=1, cap=300, tracker=None):
+        self.session = session
+        self.connect_clickhouse = connect_clickhouse
+        self.base = base
+        self.cap = cap
+        self.tracker = tracker
+        self.failures = 0  # consecutive failed cycles
+        self.ch_client = None
+        self._broken = None  # ClickHouse client to close before reconnecting
+
+    def delay(self):
+        """Seconds to wait before the next cycle."""
+        if not self.failures:
+            return 0
+        return min(self.cap, self.base * 2 ** (self.failures - 1))
+
+    def run(self, cycle):
+        """Run cycle(ch_client); returns False if it failed."""
+        try:
+            if self.ch_client is None:
+                if self._broken is not None:
+                    self._close(self._broken)
+                self.ch_client = self.connect_clickhouse()
+            mark = self._mark()
+            cycle(self.ch_client)
+        except Exception as e:
+            return self._failed(e)
+        return self._finished(mark)
+
+    async def run_async(self, cycle):
+        """Run await cycle(ch_client) with an async ClickHouse client."""
+        try:
+            if self.ch_client is None:
+                if self._broken is not None:
+                    await self._close_async(self._broken)
+                self.ch_client = await self.connect_clickhouse()
+            mark = self._mark()
+            await cycle(self.ch_client)
+        except Exception as e:
+            return self._failed(e)
+        return self._finished(mark)
+
+    def _mark(self):
+        return (
+            metrics.get("monitor_clickhouse_queries_total") or 0,
+            metrics.get("monitor_clickhouse_errors_total") or 0,
+        )
+
+    def _finished(self, mark):
+        queries, errors = self._mark()
+        queries, errors = queries - mark[0], errors - mark[1]
+        # query errors are logged and skipped by the checks; a client that
+        # failed every query is treated as broken
+        if queries and errors == queries:
+            return self._failed(
+                ConnectionError(f"all {queries} ClickHouse queries failed"),
+                client="clickhouse",
+            )
+        self.failures = 0
+        return True
+
+    def _failed(self, error, client=None):
+        if client is None:
+            if isinstance(error, SQLAlchemyError):
+                client = "postgres"
+            elif isinstance(error, ClickHouseError):
+                client = "clickhouse"
+            else:
+                client = "none"
+        self.failures += 1
+        metrics.inc("monitor_cycle_errors_total", client=client)
+        print(
+            f"Monitor cycle failed ({self.failures} in a row, retrying in "
+            f"{self.delay()}s): {type(error).__name__}: {error}"
+        )
+
+        try:
+            self.session.rollback()
+        except Exception as e:
+            print(f"Error rolling back session: {e}")
+        if self.tracker is not None:
+            # the rollback expired the tracked runs, and notifications may have
+            # been missed; reconnecting makes the tracker reconcile
+            self.tracker.close()
+        if client == "postgres":
+            metrics.inc("monitor_restarts_total", client="postgres")
+        if client == "clickhouse":
+            metrics.inc("monitor_restarts_total", client="clickhouse")
+            if self.ch_client is not None:
+                self._broken, self.ch_client = self.ch_client, None
+        return False
+
+    def _close(self, ch_client):
+        try:
+            ch_client.close()
+        except Exception as e:
+            print(f"Error closing ClickHouse client: {e}")
+        self._broken = None
+
+    async def _close_async(self, ch_client):
+        try:
+            await ch_client.close()
+        except Exception as e:
+            print(f"Error closing ClickHouse client: {e}")
+        self._broken = None
@@ -0,0 +1,226 @@
+import operator as op
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from python.server import evaluate_threshold, query_clickhouse
+from python.supervisor import isolate
+from python.triggers import describe
+from python.utils import to_utc
+
+COMPARE = {"<": op.lt, "<=": op.le, ">": op.gt, ">=": op.ge}
+EPOCH = datetime.fromtimestamp(0, timezone.utc)
+
+
+class TailState:
+    __slots__ = ("rule", "watermark", "count", "recent", "best", "seen")
+
+    def __init__(self, rule):
+        self.rule = rule
+        self.watermark = 0  # microseconds since epoch of the newest row seen
+        self.count = 0  # rows seen
+        self.recent = np.empty(0)  # last `steps` values, oldest first
+        self.best = None  # best value before `recent`, for plateau rules
+        self.seen = set()  # (step, time) of rows within the overlap
+
+    def copy(self):
+        state = TailState(self.rule)
+        state.watermark = self.watermark
+        state.count = self.count
+        state.recent = self.recent
+        state.best = self.best
+        state.seen = set(self.seen)
+        return state
+
+
+class MetricTail:
+    """Incremental trigger evaluation over new metric rows only.
+
+    A watermark is kept per (run, logName); each cycle fetches the rows newer
+    than it for every rule in one query and evaluates the rules in memory with
+    NumPy. Windowed rules keep just the last `steps` values (and the best value
+    before them for plateau rules), so the data scanned per cycle grows with
+    new data, not with run length. A rule's state is reset when the rule
+    changes and dropped when its run leaves the RUNNING set.
+
+    Rows are re-read from `overlap` seconds before the watermark, so rows
+    that reach ClickHouse late by up to that much are still seen; rows
+    already evaluated are recognized by (step, time) and skipped. State
+    advanced by a cycle is kept pending until commit(), called once the
+    cycle's alerts and status changes are committed, so a failed cycle
+    re-reads its rows.
+    """
+
+    def __init__(self, overlap=30):
+        self.overlap = overlap
+        self._state = {}  # (run id, log name) -> TailState
+        self._pending = {}  # (run id, log name) -> TailState after this cycle
+
+    def __len__(self):
+        return len(self._state)
+
+    def commit(self):
+        """Keep the state advanced since the last commit() or discard()."""
+        for key, state in self._pending.items():
+            if key in self._state and self._state[key].rule == state.rule:
+                self._state[key] = state
+        self._pending = {}
+
+    def discard(self):
+        self._pending = {}
+
+    def check(self, session, ch_client, smtp_config, runs, triggers):
+        """Evaluate every rule of `runs` over rows past their watermarks.
+
+        Returns the violations as (run, rule, last_update_time, violation_value).
+        """
+        rules = [(run, rule) for run in runs for rule in triggers.get(run)]
+        self._sync(rules, runs, triggers)
+        if not rules:
+            return []
+
+        overlap = int(self.overlap * 1e6)
+        ch_query = """
+            SELECT r.idx, m.time, m.step, m.value
+            FROM mlop_metrics AS m
+            INNER JOIN (
+                SELECT
+                    rule.1 AS idx,
+                    rule.2 AS tenantId,
+                    rule.3 AS projectName,
+                    rule.4 AS runId,
+                    rule.5 AS logName,
+                    rule.6 AS watermark
+                FROM (SELECT arrayJoin(%(rules)s) AS rule)
+            ) AS r
+                ON m.tenantId = r.tenantId
+                AND m.projectName = r.projectName
+                AND m.runId = r.runId
+                AND m.logName = r.logName
+            WHERE (m.tenantId, m.projectName, m.runId, m.logName) IN %(keys)s
+                AND m.time > fromUnixTimestamp64Micro(r.watermark)
+            ORDER BY r.idx, m.step, m.time
+        """
+        ch_params = {
+            "rules": [
+                (
+                    idx,
+                    run.organizationId,
+                    run.project.name,
+                    run.id,
+                    rule.log_name,
+                    max(0, self._get(run, rule).watermark - overlap),
+                )
+                for idx, (run, rule) in enumerate(rules)
+            ],
+            "keys": tuple(
+                (run.organizationId, run.project.name, run.id, rule.log_name)
+                for run, rule in rules
+            ),
+        }
+        try:
+            result = query_clickhouse(ch_client, ch_query, ch_params)
+        except Exception as e:
+            print(f"Error querying ClickHouse for {len(rules)} tail checks: {e}")
+            return None
+
+        rows = {}
+        for idx, time, step, value in result.result_rows:
+            rows.setdefault(idx, []).append((to_utc(time), step, value))
+
+        violations = []
+        for idx in sorted(rows):
+            run, rule = rules[idx]
+            state = self._get(run, rule).copy()
+            self._pending[(run.id, rule.log_name)] = state
+            new = []
+            for time, step, value in rows[idx]:
+                key = (step, (time - EPOCH) // timedelta(microseconds=1))
+                if key not in state.seen:
+                    state.seen.add(key)
+                    new.append((time, value))
+            if state.seen:
+                state.watermark = max(state.watermark, max(t for _, t in state.seen))
+            state.seen = {
+                (step, t) for step, t in state.seen if t > state.watermark - overlap
+            }
+            if not new:
+                continue
+            times = [time for time, _ in new]
+            values = np.asarray([value for _, value in new], dtype=float)
+            violation = isolate(run, self._evaluate, state, times, values)
+            if violation is None:
+                continue
+            last_update_time, violation_value = violation
+            if isolate(
+                run,
+                evaluate_threshold,
+                session,
+                smtp_config,
+                run,
+                rule.log_name,
+                rule.threshold,
+                rule.operator,
+                last_update_time,
+                violation_value,
+                reason=describe(rule, violation_value),
+            ):
+                violations.append((run, rule, last_update_time, violation_value))
+        return violations
+
+    def _get(self, run, rule):
+        key = (run.id, rule.log_name)
+        return self._pending.get(key) or self._state[key]
+
+    def _sync(self, rules, runs, triggers):
+        checked = {run.id for run in runs}
+        live = set()
+        for run, rule in rules:
+            key = (run.id, rule.log_name)
+            live.add(key)
+            if key not in self._state or self._state[key].rule != rule:
+                self._state[key] = TailState(rule)
+        for key in list(self._state):
+            # runs that left RUNNING were evicted from the trigger cache; rules
+            # removed from a checked run's settings are not in `live`
+            if key[0] not in triggers or (key[0] in checked and key not in live):
+                del self._state[key]
+
+    def _evaluate(self, state, times, values):
+        rule = state.rule
+        state.count += len(values)
+
+        if rule.kind == "value":
+            hits = np.flatnonzero(COMPARE[rule.operator](values, rule.threshold))
+            if hits.size:
+                return times[hits[-1]], values[hits[-1]]
+            return None
+
+        if rule.kind == "nonfinite":
+            hits = np.flatnonzero(~np.isfinite(values))
+            if hits.size:
+                return times[hits[-1]], values[hits[-1]]
+            return None
+
+        combined = np.concatenate([state.recent, values])
+        overflow, state.recent = combined[: -rule.steps], combined[-rule.steps :]
+
+        if rule.kind == "avg":
+            if state.recent.size < rule.steps:
+                return None
+            mean = state.recent.mean()
+            if COMPARE[rule.operator](mean, rule.threshold):
+                return times[-1], mean
+            return None
+
+        best = np.min if rule.kind == "plateau_min" else np.max
+        if overflow.size:
+            candidates = [best(overflow)]
+            if state.best is not None:
+                candidates.append(state.best)
+            state.best = best(candidates)
+        if state.count <= rule.steps or state.best is None:
+            return None
+        if best([best(state.recent), state.best]) == state.best:
+            return times[-1], state.best
+        return None
@@ -1,52 +1,58 @@
-def process_run_email(
-    run_name: str,
-    project_name: str,
-    last_update_time: str,
-    time_diff_seconds: int,
-    run_url: str,
-    reason: str,
-) -> str:
-    return f"""<html>
-<head>
+from html import escape
+from string import Template
+
+
+def compile_template(source: str) -> Template:
+    """Compile an email template once, at import.
+
+    Indentation and blank lines are dropped, which HTML and CSS ignore, so
+    every message sent is smaller. Fields are filled in with substitute().
+    """
+    return Template(
+        "\n".join(line.strip() for line in source.splitlines() if line.strip())
+    )
+
+
+STYLE = """
     <style>
-        body {{ 
-            font-family: Arial, sans-serif; 
-            line-height: 1.6; 
+        body {
+            font-family: Arial, sans-serif;
+            line-height: 1.6;
             color: #1a1a1a;
             background-color: #f5f5f5;
-        }}
-        .container {{ 
-            max-width: 600px; 
-            margin: 0 auto; 
+        }
+        .container {
+            max-width: 600px;
+            margin: 0 auto;
             padding: 30px;
             background-color: #ffffff;
             border-radius: 8px;
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        .header {{ 
-            color: #1a1a1a; 
-            font-size: 20px; 
+        }
+        .header {
+            color: #1a1a1a;
+            font-size: 20px;
             font-weight: bold;
             margin-bottom: 25px;
             padding-bottom: 10px;
             border-bottom: 2px solid #e0e0e0;
-        }}
-        .details {{ 
-            background-color: #f8f8f8; 
-            padding: 20px; 
-            border-radius: 6px; 
+        }
+        .details {
+            background-color: #f8f8f8;
+            padding: 20px;
+            border-radius: 6px;
             margin: 20px 0;
             border: 1px solid #e0e0e0;
-        }}
-        .details p {{
+        }
+        .details p {
             color: #1a1a1a;
             margin: 8px 0;
-        }}
-        .action {{ 
+        }
+        .action {
             margin-top: 25px;
             text-align: center;
-        }}
-        .button {{ 
+        }
+        .button {
             display: inline-block;
             padding: 12px 24px;
             background-color: #1a1a1a;
@@ -58,31 +64,131 @@ def process_run_email(
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
             border: none;
             cursor: pointer;
-        }}
-        .button:hover {{
+        }
+        .button:hover {
             background-color: #444444;
             transform: translateY(-1px);
             box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-        }}
+        }
+        li {
+            margin: 8px 0;
+        }
     </style>
+"""
+
+RUN_EMAIL = compile_template(
+    f"""
+<html>
+<head>
+{STYLE}
 </head>
 <body>
     <div class="container">
         <div class="header">⚠️ Run Status Alert</div>
-        
+
         <div class="details">
-            <p><strong>Run:</strong> {run_name}</p>
-            <p><strong>Project:</strong> {project_name}</p>
-            <p><strong>Last Seen (UTC):</strong> {last_update_time}</p>
-            <p><strong>Estimated Time Since Last Update:</strong> {time_diff_seconds} seconds</p>
-            <p><strong>Reason:</strong> {reason}</p>
+            <p><strong>Run:</strong> ${{run_name}}</p>
+            <p><strong>Project:</strong> ${{project_name}}</p>
+            <p><strong>Last Seen (UTC):</strong> ${{last_update_time}}</p>
+            <p><strong>Estimated Time Since Last Update:</strong> ${{time_diff_seconds}} seconds</p>
+            <p><strong>Reason:</strong> ${{reason}}</p>
         </div>
 
         <div class="action">
-            <a href="{run_url}" class="button">
+            <a href="${{run_url}}" class="button">
                 View Run Details
             </a>
         </div>
     </div>
 </body>
-</html>"""
+</html>
+"""
+)
+
+RUN_EMAIL_TEXT = compile_template(
+    """
+    Run Status Alert
+    Run: ${run_name}
+    Project: ${project_name}
+    Last Seen (UTC): ${last_update_time}
+    Estimated Time Since Last Update: ${time_diff_seconds} seconds
+    Reason: ${reason}
+    View Run Details: ${run_url}
+    """
+)
+
+DIGEST_EMAIL = compile_template(
+    f"""
+<html>
+<head>
+{STYLE}
+</head>
+<body>
+    <div class="container">
+        <div class="header">⚠️ ${{count}} Run Status Alerts</div>
+        <ul>
+${{items}}
+        </ul>
+    </div>
+</body>
+</html>
+"""
+)
+
+DIGEST_ITEM = Template('<li><a href="${url}">${summary}</a></li>')
+
+
+def process_run_email(
+    run_name: str,
+    project_name: str,
+    last_update_time: str,
+    time_diff_seconds: int,
+    run_url: str,
+    reason: str,
+) -> str:
+    # run and project names are nullable
+    return RUN_EMAIL.substitute(
+        run_name=escape(str(run_name or "")),
+        project_name=escape(str(project_name or "")),
+        last_update_time=escape(last_update_time),
+        time_diff_seconds=time_diff_seconds,
+        run_url=escape(run_url, quote=True),
+        reason=escape(str(reason or "")),
+    )
+
+
+def process_run_email_text(
+    run_name: str,
+    project_name: str,
+    last_update_time: str,
+    time_diff_seconds: int,
+    run_url: str,
+    reason: str,
+) -> str:
+    return RUN_EMAIL_TEXT.substitute(
+        run_name=run_name or "",
+        project_name=project_name or "",
+        last_update_time=last_update_time,
+        time_diff_seconds=time_diff_seconds,
+        run_url=run_url,
+        reason=reason or "",
+    )
+
+
+def process_digest_email(alerts: list[tuple[str, str]]) -> str:
+    return DIGEST_EMAIL.substitute(
+        count=len(alerts),
+        items="\n".join(
+            DIGEST_ITEM.substitute(
+                url=escape(url or "", quote=True), summary=escape(summary)
+            )
+            for summary, url in alerts
+        ),
+    )
+
+
+def process_digest_email_text(alerts: list[tuple[str, str]]) -> str:
+    lines = [f"{len(alerts)} Run Status Alerts"]
+    for summary, url in alerts:
+        lines.append(f"- {summary}" + (f"\n  {url}" if url else ""))
+    return "\n".join(lines)
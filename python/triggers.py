@@ -0,0 +1,233 @@
+from collections import namedtuple
+
+OPERATORS = ["<", "<=", ">", ">="]
+
+# kind is "value" for a comparison on single rows, "avg" for a moving average
+# over the last `steps` steps, "nonfinite" for NaN/Inf values and
+# "plateau_min"/"plateau_max" for no new minimum/maximum in the last `steps`.
+TriggerRule = namedtuple(
+    "TriggerRule",
+    ["log_name", "operator", "threshold", "kind", "steps"],
+    defaults=("value", 0),
+)
+
+
+def compile_trigger(log_name, trigger):
+    """Validate one loggerSettings trigger entry, returning None if invalid.
+
+    Supported entries:
+        {"operator": ">", "threshold": 1.0}                 any value > 1.0
+        {"operator": ">", "threshold": 1.0, "window": 200}  mean of last 200 steps
+        {"operator": "nonfinite"}                           NaN or Inf seen
+        {"operator": "plateau", "window": 500, "mode": "min"}
+            no new minimum ("max": maximum) in the last 500 steps
+    """
+    operator = trigger.get("operator")
+    threshold = trigger.get("threshold")
+    steps = trigger.get("window")
+
+    if operator == "nonfinite":
+        return TriggerRule(log_name, operator, None, "nonfinite")
+    if operator == "plateau":
+        mode = trigger.get("mode", "min")
+        if mode in ["min", "max"] and _is_steps(steps):
+            return TriggerRule(log_name, operator, None, f"plateau_{mode}", steps)
+        return None
+    if not (operator in OPERATORS and isinstance(threshold, (int, float))):
+        return None
+    if steps is None:
+        return TriggerRule(log_name, operator, threshold)
+    if _is_steps(steps):
+        return TriggerRule(log_name, operator, threshold, "avg", steps)
+    return None
+
+
+def compile_triggers(run):
+    """Parse and validate run.loggerSettings["trigger"] into TriggerRules."""
+    rules = []
+    triggers = (run.loggerSettings or {}).get("trigger") or {}
+    for log_name, trigger in triggers.items():
+        if not (isinstance(log_name, str) and isinstance(trigger, dict)):
+            continue
+        if not trigger.get("operator"):
+            continue
+        rule = compile_trigger(log_name, trigger)
+        if rule is None:
+            print(f"Invalid trigger for run {run.id} on {log_name}: {trigger}")
+            continue
+        rules.append(rule)
+    return rules
+
+
+class TriggerCache:
+    """Compiled trigger rules per run, recompiled when Run.updatedAt changes.
+
+    Invalid triggers are dropped at compile time, so they are reported once
+    per settings version instead of on every cycle.
+    """
+
+    def __init__(self):
+        self._rules = {}  # run id -> (updatedAt, [TriggerRule])
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __contains__(self, run_id):
+        return run_id in self._rules
+
+    def get(self, run):
+        entry = self._rules.get(run.id)
+        if entry is None or entry[0] != run.updatedAt:
+            entry = (run.updatedAt, compile_triggers(run))
+            self._rules[run.id] = entry
+        return entry[1]
+
+    def rules(self, runs):
+        """(run, log_name, operator, threshold) tuples for check_thresholds."""
+        return [
+            (run, rule.log_name, rule.operator, rule.threshold)
+            for run in runs
+            for rule in self.get(run)
+            if rule.kind == "value"
+        ]
+
+    def window_rules(self, runs):
+        """(run, TriggerRule) pairs for check_window_triggers."""
+        return [
+            (run, rule)
+            for run in runs
+            for rule in self.get(run)
+            if rule.kind != "value"
+        ]
+
+    def retain(self, runs):
+        """Evict the rules of runs that are no longer RUNNING."""
+        running = {run.id for run in runs}
+        for run_id in [run_id for run_id in self._rules if run_id not in running]:
+            del self._rules[run_id]
+
+
+def window_query(rules):
+    """One query evaluating every windowed/aggregate rule inside ClickHouse.
+
+    Rows are numbered per rule from the latest step backwards, aggregated per
+    rule, and only rules that fire come back, as (idx, time, value).
+    """
+    ch_query = """
+        SELECT
+            idx,
+            multiIf(kind = 'nonfinite', nonfinite_time, last_time) AS time,
+            multiIf(
+                kind = 'nonfinite', nonfinite_value,
+                kind = 'plateau_min', prior_min,
+                kind = 'plateau_max', prior_max,
+                recent_avg
+            ) AS value
+        FROM (
+            SELECT
+                idx,
+                any(rule_kind) AS kind,
+                any(rule_operator) AS operator,
+                any(rule_threshold) AS threshold,
+                any(rule_steps) AS steps,
+                count() AS total_count,
+                countIf(rn <= rule_steps) AS recent_count,
+                avgIf(value, rn <= rule_steps) AS recent_avg,
+                minIf(value, rn <= rule_steps) AS recent_min,
+                maxIf(value, rn <= rule_steps) AS recent_max,
+                minIf(value, rn > rule_steps) AS prior_min,
+                maxIf(value, rn > rule_steps) AS prior_max,
+                max(time) AS last_time,
+                countIf(NOT isFinite(value)) AS nonfinite_count,
+                argMaxIf(value, time, NOT isFinite(value)) AS nonfinite_value,
+                maxIf(time, NOT isFinite(value)) AS nonfinite_time
+            FROM (
+                SELECT
+                    r.idx AS idx,
+                    r.kind AS rule_kind,
+                    r.operator AS rule_operator,
+                    r.threshold AS rule_threshold,
+                    r.steps AS rule_steps,
+                    m.time AS time,
+                    m.value AS value,
+                    row_number() OVER (
+                        PARTITION BY r.idx ORDER BY m.step DESC, m.time DESC
+                    ) AS rn
+                FROM mlop_metrics AS m
+                INNER JOIN (
+                    SELECT
+                        rule.1 AS idx,
+                        rule.2 AS tenantId,
+                        rule.3 AS projectName,
+                        rule.4 AS runId,
+                        rule.5 AS logName,
+                        rule.6 AS kind,
+                        rule.7 AS operator,
+                        rule.8 AS threshold,
+                        rule.9 AS steps
+                    FROM (SELECT arrayJoin(%(rules)s) AS rule)
+                ) AS r
+                    ON m.tenantId = r.tenantId
+                    AND m.projectName = r.projectName
+                    AND m.runId = r.runId
+                    AND m.logName = r.logName
+                WHERE (m.tenantId, m.projectName, m.runId, m.logName) IN %(keys)s
+            )
+            GROUP BY idx
+        )
+        WHERE multiIf(
+            kind = 'nonfinite', nonfinite_count > 0,
+            kind = 'plateau_min', total_count > steps AND recent_min >= prior_min,
+            kind = 'plateau_max', total_count > steps AND recent_max <= prior_max,
+            recent_count >= steps AND multiIf(
+                operator = '<', recent_avg < threshold,
+                operator = '<=', recent_avg <= threshold,
+                operator = '>', recent_avg > threshold,
+                recent_avg >= threshold
+            )
+        )
+    """
+    ch_params = {
+        "rules": [
+            (
+                idx,
+                run.organizationId,
+                run.project.name,
+                run.id,
+                rule.log_name,
+                rule.kind,
+                rule.operator,
+                float(rule.threshold or 0),
+                rule.steps,
+            )
+            for idx, (run, rule) in enumerate(rules)
+        ],
+        "keys": tuple(
+            (run.organizationId, run.project.name, run.id, rule.log_name)
+            for run, rule in rules
+        ),
+    }
+    return ch_query, ch_params
+
+
+def describe(rule, value):
+    if rule.kind == "nonfinite":
+        return f"Non-finite value seen for {rule.log_name}: {value}"
+    if rule.kind in ["plateau_min", "plateau_max"]:
+        return (
+            f"No improvement for {rule.log_name} in the last {rule.steps} steps "
+            f"(best before: {value})"
+        )
+    if rule.kind == "avg":
+        return (
+            f"Threshold exceeded for {rule.log_name}: mean of last {rule.steps} "
+            f"steps {value} {rule.operator} {rule.threshold}"
+        )
+    return (
+        f"Threshold exceeded for {rule.log_name}: "
+        f"{value} {rule.operator} {rule.threshold}"
+    )
+
+
+def _is_steps(steps):
+    return isinstance(steps, int) and not isinstance(steps, bool) and steps > 0
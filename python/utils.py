@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+
 from python.sqid import sqid_encode
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import ed25519
@@ -5,6 +7,13 @@ from cryptography.hazmat.primitives.asymmetric import ed25519
 def get_run_url(host, organization, project, run_id):
     return f"{host}/o/{organization}/projects/{project}/{sqid_encode(run_id)}"
 
+def to_utc(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
 def gen_ed25519():
     private_key = ed25519.Ed25519PrivateKey.generate()
     private_bytes = private_key.private_bytes(
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from python.metrics import metrics
+
+SIGNATURE_HEADER = "X-Mlop-Signature"
+TIMESTAMP_HEADER = "X-Mlop-Timestamp"
+
+
+def sign(secret, timestamp, body):
+    """HMAC-SHA256 of "{timestamp}.{body}", as sent in SIGNATURE_HEADER."""
+    digest = hmac.new(
+        secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256
+    ).hexdigest()
+    return f"sha256={digest}"
+
+
+def pin(url, address):
+    """Rewrite `url` to connect to `address`; returns (url, Host header,
+    request extensions keeping the TLS server name)."""
+    parts = urlsplit(url)
+    userinfo = parts.netloc.rpartition("@")[0]
+    port = f":{parts.port}" if parts.port else ""
+    netloc = (f"[{address}]" if ":" in address else address) + port
+    if userinfo:
+        netloc = f"{userinfo}@{netloc}"
+    host = parts.hostname
+    if ":" in host:
+        host = f"[{host}]"
+    extensions = {"sni_hostname": parts.hostname} if parts.scheme == "https" else {}
+    return parts._replace(netloc=netloc).geturl(), host + port, extensions
+
+
+class WebhookSender:
+    """Posts alert webhooks in the background over one keep-alive client.
+
+    submit() returns at once; delivery runs as a task on the event loop. At
+    most `per_host` requests are in flight per host, and failed requests
+    (network errors, 408, 429 and 5xx responses) are retried `retries` times
+    with exponential backoff from `backoff` seconds. With a `secret`, the
+    JSON body is signed with sign(), so receivers can check it came from
+    this server and reject replays by the timestamp.
+
+    URLs are user supplied, so check_url() only lets through hosts that
+    resolve to public addresses, or that are listed in `allowed_hosts`;
+    anything else could make the server post to its own network. send()
+    connects to the address it checked, not to a second lookup of the host.
+    """
+
+    def __init__(
+        self,
+        secret=None,
+        per_host=4,
+        retries=3,
+        backoff=1,
+        timeout=10,
+        allowed_hosts=(),
+    ):
+        self.secret = secret
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.allowed_hosts = set(allowed_hosts)
+        self._client = None
+        self._hosts = {}  # host -> asyncio.Semaphore
+        self._tasks = set()
+
+    async def check_url(self, url):
+        """Raise ValueError unless `url` may receive webhooks."""
+        await self._resolve(url)
+
+    async def _resolve(self, url):
+        """The checked address to connect to for `url`, None for allowed hosts."""
+        try:
+            parts = urlsplit(url)
+            host, port = parts.hostname, parts.port
+        except ValueError:
+            raise ValueError("Invalid webhook url") from None
+        if parts.scheme not in ["http", "https"] or not host:
+            raise ValueError("Invalid webhook url")
+        if host in self.allowed_hosts:
+            return None
+        try:
+            addresses = [
+                sockaddr[0].split("%")[0]
+                for *_, sockaddr in await self._getaddrinfo(
+                    host, port or (443 if parts.scheme == "https" else 80)
+                )
+            ]
+        except (socket.gaierror, UnicodeError):
+            raise ValueError(f"Cannot resolve webhook host {host}") from None
+        if not addresses:
+            raise ValueError(f"Cannot resolve webhook host {host}")
+        for address in addresses:
+            if not self._is_public(address):
+                raise ValueError(f"Webhook host {host} is not a public address")
+        return addresses[0]
+
+    async def _getaddrinfo(self, host, port):
+        return await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+
+    def _is_public(self, address):
+        return ipaddress.ip_address(address).is_global
+
+    def submit(self, url, payload):
+        """Schedule delivery of `payload` to `url` on the running event loop."""
+        task = asyncio.get_running_loop().create_task(self.send(url, payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        metrics.inc("webhooks_queued_total")
+        return task
+
+    async def send(self, url, payload):
+        """Deliver `payload` to `url`; returns False once retries are exhausted."""
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.secret:
+            timestamp = str(int(time.time()))
+            headers[TIMESTAMP_HEADER] = timestamp
+            headers[SIGNATURE_HEADER] = sign(self.secret, timestamp, body)
+
+        host = urlsplit(url).netloc
+        try:
+            address = await self._resolve(url)
+        except ValueError as e:
+            metrics.inc("webhooks_rejected_total")
+            print(f"Not delivering webhook to {host}: {e}")
+            return False
+        extensions = {}
+        if address is not None:
+            url, headers["Host"], extensions = pin(url, address)
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                metrics.inc("webhooks_retries_total")
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                async with self._hosts[host]:
+                    response = await self._get_client().post(
+                        url, content=body, headers=headers, extensions=extensions
+                    )
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+                continue
+            if response.status_code < 400:
+                metrics.inc("webhooks_sent_total")
+                metrics.observe("webhook_delivery_seconds", time.perf_counter() - start)
+                return True
+            error = f"HTTP {response.status_code}"
+            if response.status_code < 500 and response.status_code not in (408, 429):
+                break
+        metrics.inc("webhooks_failed_total")
+        print(
+            f"Failed to deliver webhook to {host} after {attempt + 1} attempts: {error}"
+        )
+        return False
+
+    async def close(self, timeout=None):
+        """Wait up to `timeout` seconds for pending deliveries, then close."""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(keepalive_expiry=60),
+            )
+        return self._client
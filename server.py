@@ -1,4 +1,8 @@
+import hashlib
 import os
+import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from typing import Union
 
@@ -9,14 +13,29 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from compat.migrate import get_client, list_runs, migrate_all, migrate_run_v1
-from python.env import get_database_url, get_smtp_config
+from python.env import (
+    get_alert_config,
+    get_database_url,
+    get_heartbeat_config,
+    get_monitor_config,
+    get_smtp_config,
+    get_webhook_config,
+)
+from python.coalesce import dedup
 from python.docker import start_server, stop_server, stop_all
+from python.liveness import LivenessTable
+from python.notifications import alerts
+from python.recipients import recipients
 from python.models import Run, RunStatus, RunTriggers, RunTriggerType
 from python.server import check_run, send_alert, check_api_key
+from python.webhooks import WebhookSender
 
 load_dotenv()
 
 SMTP_CONFIG = get_smtp_config()
+HEARTBEAT_CONFIG = get_heartbeat_config()
+ALERT_CONFIG = get_alert_config()
+WEBHOOK_CONFIG = get_webhook_config()
 DATABASE_URL = get_database_url()
 DOMAIN = os.getenv("W_DOMAIN", "localhost")
 if not DATABASE_URL:
@@ -26,7 +45,56 @@ client = docker.from_env()
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-app = FastAPI()
+liveness = LivenessTable()
+dedup.window = ALERT_CONFIG["dedup_window"]
+recipients.ttl = get_monitor_config()["recipients_ttl"]
+alerts.size = ALERT_CONFIG["buffer_size"]
+alerts.interval = ALERT_CONFIG["flush_interval"]
+webhooks = WebhookSender(**WEBHOOK_CONFIG)
+heartbeat_auth = {}  # (sha256 of authorization, runId) -> monotonic expiry
+
+
+def flush_heartbeats():
+    while True:
+        time.sleep(HEARTBEAT_CONFIG["flush_interval"])
+        session = SessionLocal()
+        try:
+            liveness.flush(session)
+        finally:
+            session.close()
+        now = time.monotonic()
+        for key, expiry in list(heartbeat_auth.items()):
+            if expiry < now:
+                heartbeat_auth.pop(key, None)
+
+
+def flush_alerts():
+    while True:
+        time.sleep(alerts.interval)
+        if not alerts.due():
+            continue
+        session = SessionLocal()
+        try:
+            alerts.flush(session)
+        finally:
+            session.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    threading.Thread(target=flush_heartbeats, daemon=True).start()
+    threading.Thread(target=flush_alerts, daemon=True).start()
+    yield
+    await webhooks.close(timeout=WEBHOOK_CONFIG["timeout"])
+    session = SessionLocal()
+    try:
+        liveness.flush(session)
+        alerts.flush(session)
+    finally:
+        session.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 def get_db():
@@ -131,33 +199,67 @@ async def set_run_alerts(
 
     if not isinstance(alert, dict):  # TODO: add more checks
         raise HTTPException(status_code=400, detail="Invalid alert")
+    url = alert.get("url")
+    if url:
+        try:
+            await webhooks.check_url(url if isinstance(url, str) else "")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
     try:
-        send_alert(
+        last_update_time = (
+            datetime.fromtimestamp(alert.get("timestamp") / 1000, tz=timezone.utc)
+            if alert.get("timestamp")
+            else datetime.now(timezone.utc)
+        )
+        admitted = send_alert(
             session,
             run,
             SMTP_CONFIG,
-            last_update_time=datetime.fromtimestamp(
-                alert.get("timestamp") / 1000, tz=timezone.utc
-            )
-            if alert.get("timestamp")
-            else datetime.now(timezone.utc),
+            last_update_time=last_update_time,
             title=alert.get("title", "Status Update"),
             body=alert.get("body", "alert"),
             level=alert.get("level", "INFO"),
             email=alert.get("email", True),
         )
-
-        if alert.get("url"):
-            # TODO: add webhook support
-            raise HTTPException(status_code=302, detail=alert.get("url"))
-        else:
-            return {"status": "success"}
+        if alerts.full():
+            alerts.flush(session)
+
+        if url and admitted:
+            # delivered in the background; the client is not kept waiting
+            webhooks.submit(
+                url,
+                {
+                    "runId": run.id,
+                    "runName": run.name,
+                    "organizationId": run.organizationId,
+                    "title": alert.get("title", "Status Update"),
+                    "body": alert.get("body", "alert"),
+                    "level": alert.get("level", "INFO"),
+                    "timestamp": last_update_time.isoformat(),
+                },
+            )
+        return {"status": "success" if admitted else "suppressed"}
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to send alert: {e}")
 
 
+@app.post("/api/runs/heartbeat")
+async def run_heartbeat(
+    runId: int = Body(..., embed=True),
+    session: Session = Depends(get_db),
+    authorization: str = Header(None),
+):
+    now = time.monotonic()
+    key = (hashlib.sha256((authorization or "").encode()).hexdigest(), runId)
+    if heartbeat_auth.get(key, 0) < now:
+        check_run(session, runId, authorization)
+        heartbeat_auth[key] = now + HEARTBEAT_CONFIG["auth_ttl"]
+    liveness.beat(runId)
+    return {"status": "success"}
+
+
 @app.post("/api/compat/w/viewer")  # TODO: protect
 async def _viewer(key: str = Body(..., embed=True)):
     c = get_client(key, DOMAIN)
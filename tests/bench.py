@@ -0,0 +1,314 @@
+"""Monitor benchmark on synthetic runs, without production databases.
+
+Seeds an in-memory SQLite database with N RUNNING runs across M organizations
+and answers ClickHouse queries from generated metric series, then reports per
+cycle latency, queries issued and peak memory of process_runs:
+
+    python tests/bench.py
+    python tests/bench.py --runs 1000,10000 --orgs 50 --cycles 5 --tail
+"""
+
+import argparse
+import asyncio
+import contextlib
+import operator as op
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+import python.aio
+import python.server
+from python.coalesce import dedup
+from python.metrics import metrics
+from python.models import Base, Notification, Organization, Project, Run, RunStatus
+from python.notifications import alerts
+from python.scheduler import RunScheduler
+from python.tail import MetricTail
+from python.triggers import TriggerCache
+
+COMPARE = {"<": op.lt, "<=": op.le, ">": op.gt, ">=": op.ge}
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.result_rows = rows
+
+
+class SyntheticClickHouse:
+    """Answers the monitor's ClickHouse queries from in-memory metric series.
+
+    Queries are told apart by their parameters, as built by last_update_query,
+    threshold_query, window_query and MetricTail.check, and evaluated with
+    NumPy. Time spent here is reported separately from the monitor's own.
+    """
+
+    def __init__(self, series):
+        # (tenantId, projectName, runId, logName) -> (times, values)
+        self.series = series
+        self.last = {}  # (tenantId, projectName, runId) -> newest time
+        for (tenant, project, run_id, _), (times, _) in series.items():
+            key = (tenant, project, run_id)
+            self.last[key] = max(self.last.get(key, 0.0), times[-1])
+        self.queries = 0
+        self.seconds = 0.0
+
+    def query(self, query, parameters=None):
+        start = time.perf_counter()
+        self.queries += 1
+        try:
+            return FakeResult(self._rows(parameters))
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def _rows(self, params):
+        if "rules" not in params:
+            return [
+                (*key, _datetime(self.last[key]))
+                for key in params["keys"]
+                if key in self.last
+            ]
+        rules = params["rules"]
+        if not rules:
+            return []
+        width = len(rules[0])
+        if width == 7:
+            return self._thresholds(rules)
+        if width == 9:
+            return self._windows(rules)
+        return self._tail(rules)
+
+    def _thresholds(self, rules):
+        rows = []
+        for idx, tenant, project, run_id, log_name, operator, threshold in rules:
+            times, values = self.series.get((tenant, project, run_id, log_name), _EMPTY)
+            hits = np.flatnonzero(COMPARE[operator](values, threshold))
+            if hits.size:
+                rows.append((idx, _datetime(times[hits[-1]]), values[hits[-1]]))
+        return rows
+
+    def _windows(self, rules):
+        rows = []
+        for idx, *key, kind, operator, threshold, steps in rules:
+            times, values = self.series.get(tuple(key), _EMPTY)
+            if not values.size:
+                continue
+            if kind == "nonfinite":
+                hits = np.flatnonzero(~np.isfinite(values))
+                if hits.size:
+                    rows.append((idx, _datetime(times[hits[-1]]), values[hits[-1]]))
+                continue
+            recent, prior = values[-steps:], values[:-steps]
+            if kind == "plateau_min":
+                if prior.size and recent.min() >= prior.min():
+                    rows.append((idx, _datetime(times[-1]), prior.min()))
+            elif kind == "plateau_max":
+                if prior.size and recent.max() <= prior.max():
+                    rows.append((idx, _datetime(times[-1]), prior.max()))
+            elif recent.size >= steps and COMPARE[operator](recent.mean(), threshold):
+                rows.append((idx, _datetime(times[-1]), recent.mean()))
+        return rows
+
+    def _tail(self, rules):
+        rows = []
+        for idx, tenant, project, run_id, log_name, watermark in rules:
+            times, values = self.series.get((tenant, project, run_id, log_name), _EMPTY)
+            for i in np.flatnonzero(times * 1e6 > watermark):
+                rows.append((idx, _datetime(times[i]), int(i), values[i]))
+        return rows
+
+
+class AsyncSyntheticClickHouse(SyntheticClickHouse):
+    async def query(self, query, parameters=None):
+        return super().query(query, parameters)
+
+
+_EMPTY = (np.empty(0), np.empty(0))
+
+
+def _datetime(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+def generate(n_runs, n_orgs, points, seed=0):
+    """Rows for the runs table and their metric series.
+
+    Every run has a value trigger on loss; every 5th a moving average on
+    accuracy, every 10th a non-finite check on grad_norm and every 20th a
+    plateau check on val_loss. About 1% of runs breach the loss threshold,
+    1% stop logging and 0.1% log a NaN gradient.
+    """
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    steps = np.arange(points, dtype=float)
+    runs, series = [], {}
+    for i in range(1, n_runs + 1):
+        org = i % n_orgs
+        tenant, project = f"org-{org}", f"project-{org}"
+        triggers = {"loss": {"operator": ">", "threshold": 10}}
+        if i % 5 == 0:
+            triggers["accuracy"] = {"operator": "<", "threshold": 0.1, "window": 10}
+        if i % 10 == 0:
+            triggers["grad_norm"] = {"operator": "nonfinite"}
+        if i % 20 == 0:
+            triggers["val_loss"] = {"operator": "plateau", "window": 10, "mode": "min"}
+        runs.append(
+            {
+                "id": i,
+                "name": f"run-{i}",
+                "projectId": org + 1,
+                "organizationId": tenant,
+                "status": RunStatus.RUNNING,
+                "loggerSettings": {"trigger": triggers},
+                "updatedAt": datetime.fromtimestamp(now, timezone.utc),
+            }
+        )
+
+        end = now - (600 if i % 100 == 2 else rng.uniform(0, 30))
+        times = end - steps[::-1]
+        noise = rng.normal(0, 0.05, points)
+        values = {
+            "loss": 2 * np.exp(-steps / points) + noise,
+            "accuracy": 0.9 * (1 - np.exp(-3 * steps / points)) + noise,
+            "grad_norm": np.abs(noise) + 1,
+            "val_loss": 2 * np.exp(-steps / points) + noise / 10,
+        }
+        if i % 100 == 1:
+            values["loss"][-1] = 20
+        if i % 1000 == 0:
+            values["grad_norm"][-1] = np.nan
+        for log_name, trigger_values in values.items():
+            series[(tenant, project, i, log_name)] = (times, trigger_values)
+    return runs, series
+
+
+def seed(engine, n_runs, n_orgs, points):
+    runs, series = generate(n_runs, n_orgs, points)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Organization),
+            [
+                {"id": f"org-{org}", "name": f"org-{org}", "slug": f"org-{org}"}
+                for org in range(n_orgs)
+            ],
+        )
+        conn.execute(
+            insert(Project),
+            [{"id": org + 1, "name": f"project-{org}"} for org in range(n_orgs)],
+        )
+        conn.execute(insert(Run), runs)
+    return series
+
+
+def bench(n_runs, n_orgs, cycles, points, engine_name, scheduler, tail):
+    # run ids repeat across scales; start without the previous scale's alerts
+    dedup.clear()
+    alerts.clear()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    ch_client = (
+        AsyncSyntheticClickHouse if engine_name == "async" else SyntheticClickHouse
+    )(seed(engine, n_runs, n_orgs, points))
+    session = sessionmaker(bind=engine)()
+
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    options = {
+        "scheduler": RunScheduler() if scheduler else None,
+        "triggers": TriggerCache(),
+    }
+    if engine_name == "sync":
+        options["tail"] = MetricTail() if tail else None
+
+    def cycle():
+        if engine_name == "async":
+            return asyncio.run(
+                python.aio.process_runs_async(session, ch_client, {}, **options)
+            )
+        return python.server.process_runs(session, ch_client, {}, **options)
+
+    results = []
+    for i in range(cycles + 1):
+        traced = i == cycles  # one extra cycle under tracemalloc for peak memory
+        ch_client.queries, ch_client.seconds = 0, 0.0
+        checked = metrics.get("monitor_runs_checked_total") or 0
+        notifications = session.query(Notification).count()
+        statements.clear()
+
+        if traced:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            cycle()
+        latency = time.perf_counter() - start
+        peak = None
+        if traced:
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+
+        results.append(
+            {
+                "cycle": "peak" if traced else i + 1,
+                "latency": latency,
+                "clickhouse": ch_client.seconds,
+                "pg_queries": len(statements),
+                "ch_queries": ch_client.queries,
+                "checked": (metrics.get("monitor_runs_checked_total") or 0) - checked,
+                "alerts": session.query(Notification).count() - notifications,
+                "peak_mb": peak,
+            }
+        )
+    session.close()
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", default="100,1000,10000,100000")
+    parser.add_argument("--orgs", type=int, default=100)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--points", type=int, default=50, help="rows per series")
+    parser.add_argument("--engine", choices=["sync", "async"], default="sync")
+    parser.add_argument("--scheduler", action="store_true")
+    parser.add_argument("--tail", action="store_true", help="use MetricTail (sync)")
+    args = parser.parse_args()
+
+    print(
+        f"{'runs':>7} {'orgs':>5} {'cycle':>5} {'latency_s':>10} {'fake_ch_s':>10} "
+        f"{'pg_queries':>10} {'ch_queries':>10} {'checked':>8} {'alerts':>7} "
+        f"{'peak_mb':>8}"
+    )
+    for n_runs in [int(n) for n in args.runs.split(",")]:
+        n_orgs = min(args.orgs, n_runs)
+        for r in bench(
+            n_runs,
+            n_orgs,
+            args.cycles,
+            args.points,
+            args.engine,
+            args.scheduler,
+            args.tail,
+        ):
+            peak = f"{r['peak_mb']:.1f}" if r["peak_mb"] is not None else ""
+            print(
+                f"{n_runs:>7} {n_orgs:>5} {r['cycle']:>5} {r['latency']:>10.3f} "
+                f"{r['clickhouse']:>10.3f} {r['pg_queries']:>10} "
+                f"{r['ch_queries']:>10} {r['checked']:>8} {r['alerts']:>7} {peak:>8}"
+            )
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"max rss: {maxrss:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
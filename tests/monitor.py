@@ -0,0 +1,140 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import python.server
+from python.coalesce import dedup
+from python.models import (
+    Base,
+    Member,
+    Notification,
+    Organization,
+    Project,
+    Run,
+    RunStatus,
+    User,
+)
+from python.scheduler import FairQueue
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.result_rows = rows
+
+
+class FakeClickHouse:
+    """Answers the monitor's queries as if no run has logged metrics."""
+
+    def __init__(self):
+        self.queries = 0
+
+    def query(self, query, parameters=None):
+        self.queries += 1
+        return FakeResult([])
+
+
+def seed(session, n):
+    stale = datetime.now(timezone.utc) - timedelta(seconds=600)
+    session.add(Organization(id="org", name="org", slug="org"))
+    session.add(Project(id=1, name="examples"))
+    session.add(User(id="user", email="user@localhost"))
+    session.add(Member(id="member", organizationId="org", userId="user"))
+    for i in range(1, n + 1):
+        session.add(
+            Run(
+                id=i,
+                name=f"run-{i}",
+                projectId=1,
+                organizationId="org",
+                status=RunStatus.RUNNING,
+                loggerSettings={"trigger": {"loss": {"operator": ">", "threshold": 1}}},
+                updatedAt=stale,
+            )
+        )
+    session.commit()
+
+
+def count_statements(n, **options):
+    dedup.clear()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    seed(session, n)
+    session.close()
+
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement.split()[0]),
+    )
+    ch_client = FakeClickHouse()
+    python.server.process_runs(session, ch_client, smtp_config={}, **options)
+    cycle = list(statements)
+
+    assert session.query(Run).filter(Run.status == RunStatus.FAILED).count() == n
+    return cycle, ch_client.queries
+
+
+def test_process_runs_query_count():
+    for n in [1, 10, 100]:
+        statements, ch_queries = count_statements(n)
+        # one eager-loaded fetch of runs with project and organization, one
+        # bulk status UPDATE for every run that went stale
+        assert statements.count("SELECT") == 1, statements
+        assert statements.count("UPDATE") == 1, statements
+        # one staleness query and one threshold query
+        assert ch_queries == 2
+
+
+def test_heartbeats_in_batches():
+    statements, ch_queries = count_statements(
+        100, heartbeats=True, fairness=FairQueue(batch_size=10)
+    )
+    # per batch one heartbeat read; the runs that went stale in earlier
+    # batches are not autoflushed by it and still share one UPDATE
+    assert statements.count("SELECT") == 11, statements
+    assert statements.count("UPDATE") == 1, statements
+    assert ch_queries == 20
+
+
+def test_heartbeat_read_failure():
+    dedup.clear()
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    seed(session, 20)
+    session.close()
+
+    reads = []
+
+    def fail_second_read(conn, cursor, statement, *args):
+        if "run_heartbeats" in statement:
+            reads.append(statement)
+            if len(reads) == 2:
+                raise RuntimeError("connection reset")
+
+    event.listen(engine, "before_cursor_execute", fail_second_read)
+    python.server.process_runs(
+        session,
+        FakeClickHouse(),
+        smtp_config={"app_host": "localhost"},
+        heartbeats=True,
+        fairness=FairQueue(batch_size=10),
+    )
+    # the first batch's status changes survive the second batch's failed read
+    assert len(reads) == 2
+    assert session.query(Run).filter(Run.status == RunStatus.FAILED).count() == 20
+    assert session.query(Notification).count() == 20
+
+
+if __name__ == "__main__":
+    test_process_runs_query_count()
+    test_heartbeats_in_batches()
+    test_heartbeat_read_failure()
+    print("ok")
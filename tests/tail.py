@@ -0,0 +1,119 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python.replay import first_violation
+from python.tail import EPOCH, MetricTail, TailState
+from python.triggers import TriggerRule
+
+RULES = [
+    TriggerRule("loss", ">", 0.6, "avg", 5),
+    TriggerRule("loss", "<=", 0.3, "avg", 3),
+    TriggerRule("loss", "plateau", None, "plateau_min", 5),
+    TriggerRule("loss", "plateau", None, "plateau_max", 4),
+]
+
+
+def fired(rule, values, chunks):
+    """Rows at whose chunk end MetricTail._evaluate reports a violation."""
+    tail = MetricTail()
+    state = TailState(rule)
+    times = list(range(len(values)))
+    rows = []
+    start = 0
+    for size in chunks:
+        end = start + size
+        if tail._evaluate(state, times[start:end], values[start:end]) is not None:
+            rows.append(end - 1)
+        start = end
+    return rows
+
+
+def test_evaluate_matches_replay():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        values = rng.random(rng.integers(1, 40))
+        for rule in RULES:
+            rows = fired(rule, values, [1] * len(values))
+            # row by row, the first row that fires is the one replay reports
+            first = first_violation(rule, np.array([]), values)
+            assert (rows[0] if rows else None) == first, (rule, values)
+
+            # in larger batches, only the state at the end of each batch counts
+            chunks = []
+            while sum(chunks) < len(values):
+                chunks.append(int(rng.integers(1, 8)))
+            chunks[-1] -= sum(chunks) - len(values)
+            ends = set(np.cumsum(chunks) - 1)
+            assert fired(rule, values, chunks) == [i for i in rows if i in ends]
+
+
+class FakeClickHouse:
+    """Answers the tail query from `rows`, filtered by each rule's watermark."""
+
+    def __init__(self):
+        self.rows = []  # (time, step, value)
+
+    def query(self, query, parameters=None):
+        ((idx, _, _, _, _, watermark),) = parameters["rules"]
+        result = [
+            (idx, time, step, value)
+            for time, step, value in sorted(self.rows, key=lambda row: row[1])
+            if (time - EPOCH) // timedelta(microseconds=1) > watermark
+        ]
+        return SimpleNamespace(result_rows=result)
+
+
+class Triggers:
+    def __init__(self, rules):
+        self.rules = rules
+
+    def __contains__(self, run_id):
+        return run_id in self.rules
+
+    def get(self, run):
+        return self.rules[run.id]
+
+
+def test_pending_state_and_late_rows():
+    run = SimpleNamespace(id=1, organizationId="org", project=SimpleNamespace(name="p"))
+    triggers = Triggers({1: [TriggerRule("loss", ">", 1e9)]})
+    ch_client = FakeClickHouse()
+    start = datetime.now(timezone.utc) - timedelta(minutes=5)
+    ch_client.rows = [(start + timedelta(seconds=i), i, 0.5) for i in range(10)]
+    tail = MetricTail(overlap=30)
+
+    def check():
+        return tail.check(None, ch_client, {}, [run], triggers)
+
+    assert check() == []
+    # nothing is kept until the cycle commits: a failed cycle reads its rows again
+    assert tail._state[(1, "loss")].count == 0
+    tail.discard()
+    check()
+    tail.commit()
+    state = tail._state[(1, "loss")]
+    assert state.count == 10
+    assert state.watermark == (ch_client.rows[-1][0] - EPOCH) // timedelta(
+        microseconds=1
+    )
+
+    # rows re-read within the overlap are skipped; a late row there is not
+    ch_client.rows.append((start + timedelta(seconds=5, milliseconds=500), 10, 0.5))
+    check()
+    tail.commit()
+    assert tail._state[(1, "loss")].count == 11
+    check()
+    tail.commit()
+    assert tail._state[(1, "loss")].count == 11
+
+
+if __name__ == "__main__":
+    test_evaluate_matches_replay()
+    test_pending_state_and_late_rows()
+    print("ok")
@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python.templates import process_run_email, process_run_email_text
+
+
+def test_run_email_fields():
+    fields = {
+        "run_name": "<run>",
+        "project_name": "examples",
+        "last_update_time": "2026-10-18 12:00:00",
+        "time_diff_seconds": 16,
+        "run_url": "https://localhost/o/examples/1",
+        "reason": "loss > 10",
+    }
+    html = process_run_email(**fields)
+    assert "&lt;run&gt;" in html and "loss &gt; 10" in html
+    assert "Run: <run>" in process_run_email_text(**fields)
+
+    # name, project name and reason may be None
+    fields.update(run_name=None, project_name=None, reason=None)
+    assert "<strong>Run:</strong> </p>" in process_run_email(**fields)
+    assert "Run: \n" in process_run_email_text(**fields)
+
+
+if __name__ == "__main__":
+    test_run_email_fields()
+    print("ok")
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python.webhooks import SIGNATURE_HEADER, TIMESTAMP_HEADER, WebhookSender, sign
+
+
+class Receiver(ThreadingHTTPServer):
+    """Local webhook endpoint; answers each path with its queued statuses."""
+
+    def __init__(self, statuses=None, delay=0):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.statuses = statuses or {}  # path -> [status, ...], then 200
+        self.delay = delay
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.in_flight -= 1
+            server.requests.append((self.path, dict(self.headers), body))
+            statuses = server.statuses.get(self.path) or [200]
+            status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_signed_delivery():
+    receiver = Receiver()
+    sender = WebhookSender(secret="secret", allowed_hosts=["127.0.0.1"])
+
+    async def deliver():
+        assert await sender.send(receiver.url("/hook"), {"runId": 1})
+        await sender.close()
+
+    asyncio.run(deliver())
+    ((_path, headers, body),) = receiver.requests
+    assert json.loads(body) == {"runId": 1}
+    assert headers[SIGNATURE_HEADER] == sign("secret", headers[TIMESTAMP_HEADER], body)
+    receiver.shutdown()
+
+
+def test_retries():
+    receiver = Receiver({"/flaky": [503, 500, 200], "/gone": [404]})
+    sender = WebhookSender(retries=3, backoff=0.01, allowed_hosts=["127.0.0.1"])
+
+    async def deliver():
+        assert await sender.send(receiver.url("/flaky"), {})
+        assert not await sender.send(receiver.url("/gone"), {})
+        assert not await sender.send("http://127.0.0.1:1/closed", {})
+        await sender.close()
+
+    asyncio.run(deliver())
+    paths = [path for path, _, _ in receiver.requests]
+    # 5xx is retried until it succeeds, 4xx is not retried
+    assert paths.count("/flaky") == 3 and paths.count("/gone") == 1, paths
+    receiver.shutdown()
+
+
+def test_background_per_host_limit():
+    receiver = Receiver(delay=0.05)
+    sender = WebhookSender(per_host=2, allowed_hosts=["127.0.0.1"])
+
+    async def deliver():
+        start = time.perf_counter()
+        for i in range(8):
+            sender.submit(receiver.url(f"/{i}"), {"i": i})
+        # submit does not wait for delivery
+        assert time.perf_counter() - start < 0.05
+        await sender.close()
+
+    asyncio.run(deliver())
+    assert len(receiver.requests) == 8
+    assert receiver.max_in_flight == 2, receiver.max_in_flight
+    receiver.shutdown()
+
+
+class Rebinding(WebhookSender):
+    """Resolves every host to 127.0.0.1, then to 127.0.0.2; only 127.0.0.1
+    counts as public, as a rebinding host first answers with a public
+    address and then with an internal one."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.answers = ["127.0.0.1", "127.0.0.2"]
+        self.lookups = 0
+
+    async def _getaddrinfo(self, host, port):
+        address = self.answers[min(self.lookups, 1)]
+        self.lookups += 1
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+
+    def _is_public(self, address):
+        return address == "127.0.0.1"
+
+
+def test_rebinding_host_pinned():
+    receiver = Receiver()
+    sender = Rebinding()
+    port = receiver.server_address[1]
+
+    async def deliver():
+        assert await sender.send(f"http://hooks.invalid:{port}/hook", {})
+        await sender.close()
+
+    asyncio.run(deliver())
+    # one lookup, checked and connected to; the host is kept in the Host header
+    assert sender.lookups == 1
+    ((_path, headers, _body),) = receiver.requests
+    assert headers["Host"] == f"hooks.invalid:{port}"
+    receiver.shutdown()
+
+
+def test_private_hosts_rejected():
+    receiver = Receiver()
+    sender = WebhookSender()
+
+    async def deliver():
+        for url in [
+            receiver.url("/hook"),
+            "http://localhost/hook",
+            "http://10.0.0.1/hook",
+            "http://[::1]/hook",
+            "http://169.254.169.254/latest/meta-data",
+            "file:///etc/passwd",
+        ]:
+            try:
+                await sender.check_url(url)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(url)
+        assert not await sender.send(receiver.url("/hook"), {})
+        await sender.check_url("https://93.184.215.14/hook")
+        await sender.close()
+
+    asyncio.run(deliver())
+    assert receiver.requests == []
+    receiver.shutdown()
+
+
+if __name__ == "__main__":
+    test_signed_delivery()
+    test_retries()
+    test_background_per_host_limit()
+    test_private_hosts_rejected()
+    test_rebinding_host_pinned()
+    print("ok")